@@ -1,6 +1,12 @@
-from arago.actors.actor import Actor, Task, ActorStoppedError
+from arago.actors.actor import Actor, Task, Message, ActorStoppedError, TaskCanceledError, TaskExpiredError
+from arago.actors.mailbox import Mailbox, BoundedMailbox, PriorityMailbox, MailboxFullError, BLOCK, REJECT, DROP_NEWEST, DROP_OLDEST
+from arago.actors.durable_mailbox import DurableMailbox
+from arago.actors.scheduling import YieldBudget
 from arago.actors.monitor import Monitor, Root, SHUTDOWN, RESTART, RESUME, ESCALATE, IGNORE, DEPLETE
+from arago.actors.memoize import Memoizing, ResultCache, INVALIDATE, INVALIDATE_ALL
+from arago.actors.snapshot import Snapshotting, SNAPSHOT
 from arago.actors.router import Router
 from arago.actors.source import Source
 from arago.actors.agent import Agent
-
+from arago.actors.scheduler import Scheduler
+from arago.actors.remote import ActorRef
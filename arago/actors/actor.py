@@ -1,13 +1,16 @@
 import gevent, gevent.event, gevent.greenlet, gevent.queue, greenlet
-import random, pickle, logging, weakref
+import random, pickle, logging, weakref, time
 from types import SimpleNamespace
 from function_pattern_matching import MultiFunc
-import inspect
+from arago.actors import pattern_matching as matching
 from functools import partial
 import better_exceptions
 import sys
 
 from gevent import GreenletExit
+from arago.actors.mailbox import Mailbox, BLOCK
+from arago.actors.timer_wheel import TimerWheel
+from arago.actors import scheduling
 
 class ActorStoppedError(Exception):
 	__str__ = lambda x: "ActorStoppedError"
@@ -21,16 +24,42 @@ class ActorTTLError(Exception):
 class TaskCanceledError(Exception):
     __str__ = lambda x: "TaskCanceledError"
 
+class TaskExpiredError(Exception):
+    __str__ = lambda x: "TaskExpiredError"
+
+def current_actor():
+	"""Return the actor in whose greenlet (or a greenlet spawned from it) we are running, or None"""
+	current = gevent.getcurrent()
+	greenlet = current
+	while greenlet is not None:
+		actor = getattr(greenlet, '_actor', None)
+		if actor is not None:
+			try:
+				if not isinstance(actor, Actor):
+					return None
+			except ReferenceError:
+				return None
+			if greenlet is not current:
+				current._actor = actor
+			return actor
+		spawning_greenlet = getattr(greenlet, 'spawning_greenlet', None)
+		greenlet = spawning_greenlet() if spawning_greenlet else None
+	return None
+
 class Task(gevent.event.AsyncResult):
-	def __init__(self, msg, payload=None, sender=None):
+	def __init__(self, msg, payload=None, sender=None, priority=0, deadline=None):
 		super().__init__()
 		self.msg = msg
 		self._payload = payload # pickle.dumps(payload, protocol=pickle.HIGHEST_PROTOCOL)
 		self.sender = sender
+		self.priority = priority
+		self.deadline = deadline
 		self.canceled = False
 
 	def cancel(self):
 		self.canceled = True
+		if not self.ready():
+			self.set_exception(TaskCanceledError())
 
 	@property
 	def payload(self):
@@ -38,29 +67,58 @@ class Task(gevent.event.AsyncResult):
 		#return pickle.loads(self._payload)
 
 	def set(self, value=None):
+		"""Resolve the task with value, unless it was canceled (and thus failed with TaskCanceledError)"""
 		if self.canceled:
-			return TaskCanceledError
-		return super().set(value)
-
-	def get(self, *args, **kwargs):
-		if self.canceled:
-			return TaskCanceledError
-		return super().get(*args, **kwargs)
+			return
+		super().set(value)
 
 	def __str__(self):
 		return ("<Task, sender={sender}, message={msg}>"
 		).format(sender=self.sender, msg=self.msg)
 
+class Message(object):
+	"""Envelope for messages sent with tell(), nobody waits for a result"""
+	__slots__ = ("msg", "payload", "sender", "priority", "deadline")
+	canceled = False
+
+	def __init__(self, msg, payload=None, sender=None, priority=0, deadline=None):
+		self.msg = msg
+		self.payload = payload
+		self.sender = sender
+		self.priority = priority
+		self.deadline = deadline
+
+	def set(self, value=None):
+		pass
+
+	def set_exception(self, exception, exc_info=None):
+		pass
+
+	def ready(self):
+		return False
+
+	def __str__(self):
+		return ("<Message, sender={sender}, message={msg}>"
+		).format(sender=self.sender, msg=self.msg)
+
 class Actor(object):
-	def __init__(self, name=None, max_idle=None, ttl=None, loop=None, context=None, *args, **kwargs):
+	def __init__(self, name=None, max_idle=None, ttl=None, loop=None, context=None, batch_size=None,
+	             mailbox=Mailbox, mailbox_size=None, overflow=BLOCK, budget=None, *args, **kwargs):
 		self.context = context if context else SimpleNamespace()
 		self._logger = logging.getLogger('root')
-		self._mailbox = gevent.queue.Queue()
+		self._mailbox = mailbox(maxsize=mailbox_size, overflow=overflow)
 		self._stopped = False
 		self._poisoned_pill = object()
 		self._ping_pill = object()
 		self._max_idle = max_idle
 		self._ttl = ttl
+		self._batch_size = batch_size
+		self._budget = budget
+		self._busy = False
+		self._report_load = False
+		self._track_latency = False
+		self._latency_alpha = 0.2
+		self.latency = None
 		self._loop = gevent.spawn(loop) if loop else gevent.spawn(self._dequeue, weakref.proxy(self))
 		self.name=name if name else "actor-{0}".format(self._loop.minimal_ident)
 
@@ -68,6 +126,11 @@ class Actor(object):
 	def prepare(cls, *args, **kwargs):
 		return partial(cls, *args, **kwargs)
 
+	@property
+	def load(self):
+		"""Number of messages waiting in the mailbox or being handled"""
+		return len(self._mailbox) + self._busy
+
 	def __str__(self):
 		return "<{type} \"{name}\">".format(type=type(self).__name__, name=self.name)
 
@@ -75,7 +138,7 @@ class Actor(object):
 		try:
 			self._logger.trace("{me} starts handling {task}".format(me=self, task=task))
 			if isinstance(self.handle, MultiFunc):
-				task.set(self.handle(self, task.msg, task.payload, task.sender))
+				task.set(matching.compiled(self.handle)(self, task.msg, task.payload, task.sender))
 			else:
 				task.set(self.handle(task.msg, task.payload, task.sender))
 			return task
@@ -83,31 +146,112 @@ class Actor(object):
 			task.set_exception(e)
 			raise
 
+	def _handle_batch(self, tasks):
+		try:
+			self._logger.trace("{me} starts handling a batch of {n} tasks".format(me=self, n=len(tasks)))
+			started = time.monotonic() if self._track_latency else None
+			self.handle_batch(tasks)
+			if started is not None:
+				self._record_latency((time.monotonic() - started) / len(tasks))
+			return tasks
+		except Exception as e:
+			for task in tasks:
+				if not task.ready():
+					task.set_exception(e)
+			raise
+
+	def _drain(self, task):
+		"""Take task and up to batch_size - 1 more messages that are already waiting in the mailbox"""
+		batch = [task]
+		while len(self._mailbox) > 0 and (not self._batch_size or len(batch) < self._batch_size):
+			if task is self._poisoned_pill:
+				break
+			task = self._mailbox.get_nowait()
+			batch.append(task)
+		return batch
+
+	def _process_batch(self, batch):
+		tasks = []
+		for task in batch:
+			if isinstance(task, (Message, Task)) and not self._shed(task):
+				tasks.append(task)
+			elif task is self._poisoned_pill:
+				self._logger.trace("{me} is processing the poisoned pill.".format(me=self))
+				if tasks:
+					self._handle_batch(tasks)
+				for item in batch:
+					self._mailbox.ack(item)
+				self._reject_waiting()
+				raise ActorStoppedError
+			elif task is self._ping_pill:
+				self._logger.debug("{me} is processing a ping.".format(me=self))
+		if tasks:
+			self._handle_batch(tasks)
+		for item in batch:
+			self._mailbox.ack(item)
+
+	def _reject_waiting(self):
+		"""Fail the asked tasks that are still in the mailbox when the poisoned pill is taken, it may have overtaken them"""
+		for task in self._mailbox.take(lambda item: isinstance(item, Task)):
+			self._logger.trace("{me} is rejecting {task}".format(me=self, task=task))
+			task.set_exception(ActorStoppedError())
+
+	def _shed(self, task):
+		"""Dismiss task if it was canceled or its deadline has passed, return True if so"""
+		if task.canceled:
+			self._logger.trace("{me} took canceled {task} from mailbox, dismissing".format(me=self, task=task))
+			self._mailbox.stats["canceled"] += 1
+			return True
+		elif task.deadline is not None and time.monotonic() > task.deadline:
+			self._logger.trace("{me} took expired {task} from mailbox, dismissing".format(me=self, task=task))
+			self._mailbox.stats["expired"] += 1
+			task.set_exception(TaskExpiredError())
+			return True
+		return False
+
 	def _dequeue(self, parent):
-		self._ttl_timeout = gevent.Timeout.start_new(timeout=self._ttl, exception=ActorTTLError)
-		self._max_idle_timeout = gevent.Timeout.start_new(timeout=self._max_idle, exception=ActorMaxIdleError)
+		current = gevent.getcurrent()
+		current._actor = parent
+		current._budget = self._budget
+		wheel = TimerWheel.instance()
+		self._idle_since = time.monotonic()
+		self._ttl_deadline = wheel.add(self._idle_since + self._ttl, partial(Actor._ttl_expired, parent)) if self._ttl else None
+		self._max_idle_deadline = wheel.add(self._idle_since + self._max_idle, partial(Actor._max_idle_expired, parent)) if self._max_idle else None
 		self._stopped = False
 		self._crashed = False
 		try:
 			while True:
 				try:
 					for task in self._mailbox:
-						gevent.idle()
-						self._max_idle_timeout.close()
-						if self._max_idle:
-							self._logger.trace("{me} has canceled timeout of {max_idle} seconds".format(me=self, max_idle=self._max_idle))
-						if isinstance(task, Task) and not task.canceled:
+						scheduling.cooperate()
+						self._idle_since = None
+						self._busy = True
+						if self._batch_size is not None:
+							self._process_batch(self._drain(task))
+						elif isinstance(task, (Message, Task)) and not self._shed(task):
 							self._logger.trace("{me} took {task} from mailbox".format(me=self, task=task))
-							self._handle(task)
+							if self._track_latency:
+								started = time.monotonic()
+								self._handle(task)
+								self._record_latency(time.monotonic() - started)
+							else:
+								self._handle(task)
+							self._mailbox.ack(task)
+						elif isinstance(task, (Message, Task)):
+							self._mailbox.ack(task)
 						elif task is self._poisoned_pill:
 							self._logger.trace("{me} is processing the poisoned pill.".format(me=self))
+							self._reject_waiting()
 							raise ActorStoppedError
 						elif task is self._ping_pill:
 							self._logger.debug("{me} is processing a ping.".format(me=self))
-						elif isinstance(task, Task) and task.canceled:
-							self._logger.trace("{me} took canceled {task} from mailbox, dismissing".format(me=self, task=task))
-							continue
-						self._max_idle_timeout = gevent.Timeout.start_new(timeout=self._max_idle, exception=ActorMaxIdleError)
+						self._busy = False
+						if self._report_load:
+							self._parent._child_load_changed(self)
+						if self._max_idle:
+							self._idle_since = time.monotonic()
+						if len(self._mailbox) == 0:
+							scheduling.rest()
 				except ActorMaxIdleError as e:
 					self._logger.trace("{me} has reached max_idle timeout of {sec} seconds.".format(me=self, sec=self._max_idle))
 					self.stop(wait=False)  # FIXME!!!!
@@ -122,6 +266,7 @@ class Actor(object):
 			formatted_exc = better_exceptions.format_exception(*sys.exc_info())
 			self._logger.error(("{me} crashed with:\n{exc}").format(me=self, exc=formatted_exc))
 		finally:
+			self._busy = False
 			self._logger.trace("{me} is executing on_stop() handler".format(me=self))
 			try:
 				self.on_stop()
@@ -130,31 +275,49 @@ class Actor(object):
 				formatted_exc = better_exceptions.format_exception(*sys.exc_info())
 				self._logger.error(("{me} crashed while executing on_stop() handler with:\n{exc}").format(me=self, exc=formatted_exc))
 			self._logger.trace("{me} has finished on_stop() handler".format(me=self))
-			self._ttl_timeout.close()
-			self._max_idle_timeout.close()
+			if self._ttl_deadline:
+				self._ttl_deadline.cancel()
+			if self._max_idle_deadline:
+				self._max_idle_deadline.cancel()
+			self._mailbox.release()
+			self._mailbox.close()
 			if hasattr(self, "_parent"):
 				self._parent._handle_child(self, "crashed" if self._crashed else "stopped")
 
+	def _record_latency(self, sample):
+		"""Update the exponentially weighted moving average of handling times"""
+		if self.latency is None:
+			self.latency = sample
+		else:
+			self.latency += self._latency_alpha * (sample - self.latency)
+
+	def _max_idle_expired(self, now):
+		if self._idle_since is None:
+			return now + self._max_idle
+		elif self._idle_since + self._max_idle > now:
+			return self._idle_since + self._max_idle
+		self._loop.kill(ActorMaxIdleError, block=False)
+
+	def _ttl_expired(self, now):
+		self._loop.kill(ActorTTLError, block=False)
+
 	def handle(self, message, payload=None, sender=None):
 		"""Override in your own Actor subclass"""
 		raise NotImplementedError('Please subclass Actor and implement the handle() method')
 
-	def _receive(self, msg, payload=None, sender=None):
-		gevent.idle() # UGLY: Find a better place for this
-		sending_greenlet = gevent.getcurrent()
-		if sender:
-			sender = sender
-		elif isinstance(getattr(sending_greenlet, '_actor', None), Actor):
-			sender = sending_greenlet._actor
-		elif isinstance(sending_greenlet, Actor):
-			sender = sending_greenlet
-		else:
-			l = inspect.stack()[1][0].f_locals
-			if "self" in l:
-				sender = l["self"]
-			else:
-				sender = None
-		task = Task(msg, payload, sender)
+	def handle_batch(self, tasks):
+		"""Override in your own Actor subclass to process a whole batch at once.
+		Only called if the actor was created with batch_size, which limits
+		the number of tasks per batch (0 means: everything that is waiting).
+		Every task has to be completed with task.set() or task.set_exception()."""
+		for task in tasks:
+			self._handle(task)
+
+	def _receive(self, msg, payload=None, sender=None, priority=0, envelope=Task, deadline=None):
+		scheduling.cooperate()
+		if not sender:
+			sender = current_actor()
+		task = envelope(msg, payload, sender, priority, deadline)
 		return self._enqueue(task)
 
 	def _enqueue(self, task):
@@ -164,6 +327,8 @@ class Actor(object):
 		else:
 			self._mailbox.put(task)
 			self._logger.trace("{me} received {task}".format(me=self, task=task))
+			if self._report_load:
+				self._parent._child_load_changed(self)
 		return task
 
 	def _kill(self):
@@ -176,20 +341,30 @@ class Actor(object):
 		self.clear()
 		self._parent._handle_child(self, "stopped")
 
-	def tell(self, msg, payload=None, sender=None):
-		"""Send a message, get nothing (fire-and-forget)."""
-		self._receive(msg, payload=payload, sender=sender)
+	def tell(self, msg, payload=None, sender=None, priority=0, deadline=None):
+		"""Send a message, get nothing (fire-and-forget).
+		If the message is still waiting at deadline (a time.monotonic() value), it is dropped."""
+		self._receive(msg, payload=payload, sender=sender, priority=priority, envelope=Message, deadline=deadline)
 
-	def ask(self, msg, payload=None, sender=None):
-		"""Send a message, get a future."""
-		return self._receive(msg, payload=payload, sender=sender)
+	def ask(self, msg, payload=None, sender=None, priority=0, deadline=None):
+		"""Send a message, get a future.
+		If the message is still waiting at deadline (a time.monotonic() value), the future fails with TaskExpiredError."""
+		return self._receive(msg, payload=payload, sender=sender, priority=priority, deadline=deadline)
 
-	def wait_for(self, msg, payload=None, sender=None, timeout=None, retry=1):
-		"""Send a message, get a result"""
+	def wait_for(self, msg, payload=None, sender=None, timeout=None, retry=1, priority=0, deadline=None):
+		"""Send a message, get a result.
+		A message that timed out is canceled, so it won't be handled if it hasn't been yet."""
 		for it in range(retry):
+			expires = deadline
+			if timeout is not None:
+				expires = time.monotonic() + timeout if deadline is None else min(deadline, time.monotonic() + timeout)
+			task = None
 			try:
-				return self._receive(msg, payload=payload, sender=sender).get(timeout=timeout)
-			except (ActorStoppedError, gevent.Timeout) as exc:
+				task = self._receive(msg, payload=payload, sender=sender, priority=priority, deadline=expires)
+				return task.get(timeout=timeout)
+			except (ActorStoppedError, TaskExpiredError, gevent.Timeout) as exc:
+				if task is not None:
+					task.cancel()
 				last_exc = exc
 				continue
 		raise last_exc
@@ -206,7 +381,7 @@ class Actor(object):
 		if not self._stopped:
 			self._stopped = True
 			self._logger.debug("{me} received order to stop.".format(me=self))
-			self._mailbox.put(self._poisoned_pill)
+			self._mailbox.put_system(self._poisoned_pill)
 			if wait:
 				self._logger.trace("{me} is waiting for remaining messages to be processed.".format(me=self))
 				self.join()
@@ -219,7 +394,7 @@ class Actor(object):
 	def ping(self):
 		if not self._stopped:
 			self._logger.debug("{me} received ping message.".format(me=self))
-			self._mailbox.put(self._ping_pill)
+			self._mailbox.put_system(self._ping_pill)
 		else:
 			self._logger.debug("{me} is stopped.".format(me=self))
 
@@ -229,7 +404,12 @@ class Actor(object):
 			task = self._mailbox.get()
 			if isinstance(task, Task):
 				self._logger.trace("{me} is rejecting {task}".format(me=self, task=task))
-				task.set_exception(ActorStoppedError)
+				task.set_exception(ActorStoppedError())
+			elif isinstance(task, Message):
+				self._logger.trace("{me} is discarding {task}".format(me=self, task=task))
+		self._mailbox.release()
+		if self._report_load:
+			self._parent._child_load_changed(self)
 
 	def resume(self):
 		self.start()
@@ -247,6 +427,12 @@ class Actor(object):
 		self.clear()
 		self._logger.debug("{me} was destroyed properly".format(me=self))
 
+	@property
+	def mailbox_stats(self):
+		"""Number of messages blocked, rejected or dropped by the overflow policy,
+		and of messages that were dismissed because they were canceled or expired"""
+		return self._mailbox.stats
+
 	def register_parent(self, parent):
 		self._parent = weakref.proxy(parent)
 		self._logger.debug("{me} registered {par} as its parent.".format(me=self, par=parent))
@@ -0,0 +1,288 @@
+import gevent
+import logging
+import os
+import pickle
+import struct
+import zlib
+from collections import OrderedDict
+from arago.actors.actor import Message
+from arago.actors.mailbox import BoundedMailbox, BLOCK
+
+# Record kinds
+PUT = 1
+ACK = 2
+
+
+class Journal(object):
+	("""Append-only log of messages, kept as numbered segment files in directory. A record is """
+	 """a header (body length, CRC32 of the body, kind, sequence number) followed by the body. """
+	 """Messages are made durable in groups (group commit): once sync_every messages and """
+	 """acknowledgements are waiting or sync_interval seconds after the first one, whichever """
+	 """comes first, a greenlet pickles and writes them, then fsyncs the segment in the hub's """
+	 """thread pool, so writers never wait for the disk. A message that was acknowledged before """
+	 """its group was written is never written at all, the acknowledgements of the others are """
+	 """written as one record per group. With fsync=False, groups are only flushed to the OS, """
+	 """which survives a crash of the process but not of the machine. Once a segment has grown """
+	 """to segment_size bytes and to twice the size of the records of the messages not """
+	 """acknowledged yet, the same greenlet copies these to a new segment and deletes the old """
+	 """one (compaction).""")
+	_header = struct.Struct("!IIBQ")
+	_seq = struct.Struct("!Q")
+
+	def __init__(self, directory, sync_every=256, sync_interval=0.01, fsync=True, segment_size=64 << 20):
+		self._logger = logging.getLogger('root')
+		self.directory = directory
+		self._sync_every = sync_every
+		self._sync_interval = sync_interval
+		self._fsync = fsync
+		self._segment_size = segment_size
+		self._live = OrderedDict() # records of the written messages that were not acknowledged
+		self._live_size = 0
+		self._unwritten = OrderedDict() # bodies of the messages appended since the last group
+		self._acks = []
+		self._unsynced = 0
+		self._timer = None
+		self._syncer = None
+		self._file = None
+		self._size = 0
+		self._number = 0
+		os.makedirs(directory, exist_ok=True)
+		self._sequence = self._recover()
+		self._roll()
+
+	def __len__(self):
+		return len(self._live) + len(self._unwritten)
+
+	def _path(self, number):
+		return os.path.join(self.directory, "{n:016d}.log".format(n=number))
+
+	def _segments(self):
+		return sorted(int(name[:-4]) for name in os.listdir(self.directory)
+		              if name.endswith(".log") and name[:-4].isdigit())
+
+	def _recover(self):
+		"""Read all segments, keep the records of messages that were not acknowledged, return the next sequence number"""
+		header = self._header
+		sequence = 0
+		for number in self._segments():
+			self._number = number
+			with open(self._path(number), "rb") as segment:
+				data = segment.read()
+			position = 0
+			while len(data) - position >= header.size:
+				size, crc, kind, seq = header.unpack_from(data, position)
+				end = position + header.size + size
+				if end > len(data) or zlib.crc32(data[position + header.size:end]) != crc:
+					break
+				if kind == PUT:
+					self._keep(seq, data[position:end])
+				elif kind == ACK and size:
+					for acked, in self._seq.iter_unpack(data[position + header.size:end]):
+						self._forget(acked)
+				elif kind == ACK:
+					self._forget(seq)
+				sequence = max(sequence, seq + 1)
+				position = end
+			if position < len(data):
+				self._logger.warn("{me} ignores {n} bytes of torn records at the end of {path}".format(me=self, n=len(data) - position, path=self._path(number)))
+		return sequence
+
+	def recovered(self):
+		"""Yield (sequence number, body) of the messages that were in the journal when it was opened"""
+		for seq, record in list(self._live.items()):
+			try:
+				yield seq, pickle.loads(record[self._header.size:])
+			except Exception as err:
+				self._logger.error("{me} failed to read message {seq}, keeping it: {err}".format(me=self, seq=seq, err=err))
+
+	def append(self, body):
+		"""Journal body with the next group, return its sequence number"""
+		seq = self._sequence
+		self._sequence += 1
+		self._unwritten[seq] = body
+		self._unsynced += 1
+		if self._unsynced >= self._sync_every or self._timer is None:
+			self._schedule()
+		return seq
+
+	def ack(self, seq):
+		"""Mark message seq as done, it won't be recovered any more"""
+		if self._unwritten.pop(seq, None) is not None:
+			return
+		record = self._live.pop(seq, None)
+		if record is not None:
+			self._live_size -= len(record)
+			self._acks.append(seq)
+			self._unsynced += 1
+			if self._unsynced >= self._sync_every or self._timer is None:
+				self._schedule()
+
+	def _keep(self, seq, record):
+		self._forget(seq)
+		self._live[seq] = record
+		self._live_size += len(record)
+
+	def _forget(self, seq):
+		record = self._live.pop(seq, None)
+		if record is None:
+			return False
+		self._live_size -= len(record)
+		return True
+
+	def _schedule(self):
+		if self._sync_every is not None and self._unsynced >= self._sync_every:
+			self._request_sync()
+		elif self._timer is None and self._syncer is None and self._sync_interval is not None:
+			self._timer = gevent.get_hub().loop.timer(self._sync_interval)
+			self._timer.start(self._request_sync)
+
+	def _request_sync(self):
+		"""Wake the syncer greenlet, never blocks, so it may be called from event loop callbacks"""
+		if self._timer is not None:
+			self._timer.close()
+			self._timer = None
+		if self._syncer is None:
+			self._syncer = gevent.spawn(self._sync)
+
+	def sync(self):
+		"""Write and flush (and fsync) everything appended or acknowledged so far"""
+		self._request_sync()
+		self._syncer.join()
+
+	def _sync(self):
+		"""Write groups and compact the journal until there is nothing left to do"""
+		try:
+			while self._unsynced:
+				self._flush()
+				if self._size >= self._segment_size and self._size >= 2 * self._live_size:
+					self._roll()
+		finally:
+			self._syncer = None
+
+	def _append(self, data):
+		if self._file is None:
+			self._file = open(self._path(self._number), "ab")
+		self._file.write(data)
+		self._size += len(data)
+
+	def _write_unwritten(self):
+		"""Pickle and write the messages appended since the last group"""
+		header = self._header
+		unwritten, self._unwritten = self._unwritten, OrderedDict()
+		records = []
+		for seq, body in unwritten.items():
+			try:
+				data = pickle.dumps(body, protocol=pickle.HIGHEST_PROTOCOL)
+			except Exception as err:
+				self._logger.error("{me} failed to write message {seq}, it won't be recovered: {err}".format(me=self, seq=seq, err=err))
+				continue
+			record = header.pack(len(data), zlib.crc32(data), PUT, seq) + data
+			self._live[seq] = record
+			self._live_size += len(record)
+			records.append(record)
+		self._append(b"".join(records))
+
+	def _write_acks(self):
+		"""Write one record acknowledging all written messages acknowledged since the last group"""
+		body = b"".join(self._seq.pack(seq) for seq in self._acks)
+		self._acks = []
+		self._append(self._header.pack(len(body), zlib.crc32(body), ACK, 0) + body)
+
+	def _flush(self):
+		self._unsynced = 0
+		if self._unwritten:
+			self._write_unwritten()
+		if self._acks:
+			self._write_acks()
+		if self._file is None:
+			return
+		self._file.flush()
+		if self._fsync:
+			gevent.get_hub().threadpool.apply(os.fsync, (self._file.fileno(),))
+
+	def _roll(self):
+		"""Start a new segment with the records of the messages not acknowledged yet, delete the old ones"""
+		if self._acks:
+			self._write_acks() # the old segment stays valid until the new one is durable
+		old, obsolete = self._file, self._segments()
+		self._number += 1
+		self._file = open(self._path(self._number), "ab")
+		self._size = 0
+		self._append(b"".join(self._live.values()))
+		if old is not None:
+			old.close()
+		self._flush()
+		for number in obsolete:
+			if number < self._number:
+				os.unlink(self._path(number))
+		self._logger.debug("{me} started segment {n} with {m} messages".format(me=self, n=self._number, m=len(self._live)))
+
+	def close(self):
+		"""Write, flush and close the segment, the next write opens it again"""
+		if self._timer is not None:
+			self._timer.close()
+			self._timer = None
+		if self._syncer is not None:
+			self._syncer.join()
+		self._flush()
+		if self._file is not None:
+			self._file.close()
+			self._file = None
+
+	def __str__(self):
+		return "<Journal at {dir}, {n} messages>".format(dir=self.directory, n=len(self))
+
+
+class DurableMailbox(BoundedMailbox):
+	("""FIFO mailbox that journals its messages in directory, use it as """
+	 """Actor(mailbox=partial(DurableMailbox, directory)). See Journal for the other arguments. """
+	 """A message is acknowledged once the actor has handled it successfully or dismissed it, """
+	 """a message the handler failed on stays in the journal. When the mailbox is opened, the """
+	 """messages left in the journal are enqueued again, as told messages, in their original """
+	 """order: after a crash, whatever was not handled is delivered (at least once). Messages """
+	 """and payloads are pickled, senders and deadlines are not journaled. Use a directory """
+	 """for one mailbox at a time. Messages discarded by Actor.clear() (asks fail with """
+	 """ActorStoppedError as usual) are not acknowledged, they stay in the journal. The actor """
+	 """closes the mailbox whenever it stops, the journal is opened again on the next write.""")
+	def __init__(self, directory, maxsize=None, overflow=BLOCK, **kwargs):
+		super().__init__(maxsize=maxsize, overflow=overflow)
+		self.journal = Journal(directory, **kwargs)
+		self._journaled = {} # messages that were neither acknowledged nor given up, with their sequence numbers
+		for seq, (msg, payload, priority) in self.journal.recovered():
+			message = Message(msg, payload, None, priority)
+			self._journaled[id(message)] = (message, seq)
+			BoundedMailbox._push(self, message)
+			self.stats["replayed"] += 1
+
+	def _push(self, item):
+		self._journaled[id(item)] = (item, self.journal.append((item.msg, item.payload, item.priority)))
+		BoundedMailbox._push(self, item)
+
+	def put_system(self, item):
+		"""Enqueue a control message, regardless of capacity and without journaling it"""
+		self._system.add(id(item))
+		BoundedMailbox._push(self, item)
+
+	def take(self, predicate):
+		taken = super().take(predicate)
+		for item in taken:
+			self._journaled.pop(id(item), None)
+		return taken
+
+	def ack(self, item):
+		entry = self._journaled.pop(id(item), None)
+		if entry is not None:
+			self.journal.ack(entry[1])
+
+	def release(self):
+		"""Forget the messages the actor took and did not acknowledge, they stay in the journal"""
+		queued = set(map(id, self.queue))
+		self._journaled = {key: entry for key, entry in self._journaled.items() if key in queued}
+
+	def _discard(self, item):
+		super()._discard(item)
+		self.ack(item)
+
+	def close(self):
+		self.release()
+		self.journal.close()
@@ -0,0 +1,187 @@
+import gevent, gevent.event, gevent.queue
+import heapq, itertools
+from collections import Counter, deque
+
+
+class MailboxFullError(Exception):
+	__str__ = lambda x: "MailboxFullError"
+
+
+class OverflowPolicy(object):
+	def __init__(self, identifier):
+		self.__ident__ = identifier
+	def __str__(self):
+		return self.__ident__
+
+BLOCK = OverflowPolicy("BLOCK") # block the sender until there is room again
+REJECT = OverflowPolicy("REJECT") # raise MailboxFullError in the sender
+DROP_NEWEST = OverflowPolicy("DROP_NEWEST") # discard (and cancel) the message that did not fit
+DROP_OLDEST = OverflowPolicy("DROP_OLDEST") # discard (and cancel) the oldest message to make room
+
+
+class Mailbox(gevent.queue.Queue):
+	("""FIFO mailbox, holding at most maxsize messages if maxsize is given (a BoundedMailbox """
+	 """is created then). Without maxsize, put() and get() are gevent's own and control """
+	 """messages simply queue up behind the others.""")
+	def __new__(cls, *args, **kwargs):
+		if cls is Mailbox and kwargs.get("maxsize", args[0] if args else None) is not None:
+			cls = BoundedMailbox
+		return gevent.queue.Queue.__new__(cls)
+
+	def __init__(self, maxsize=None, overflow=BLOCK):
+		super().__init__()
+		self.capacity = maxsize
+		self.overflow = overflow
+		self.stats = Counter()
+
+	put_system = gevent.queue.Queue.put
+
+	def ack(self, item):
+		"""Called by the actor once item has been handled successfully or dismissed"""
+		pass
+
+	def release(self):
+		"""Called by the actor when it gives up the messages it took and did not acknowledge"""
+		pass
+
+	def close(self):
+		"""Called by the actor whenever it stops"""
+		pass
+
+	def take(self, predicate):
+		"""Remove and return the messages for which predicate is true, in order, keeping the others"""
+		taken, kept = [], deque()
+		for item in self.queue:
+			(taken if predicate(item) else kept).append(item)
+		if taken:
+			self.queue = kept
+		return taken
+
+
+class BoundedMailbox(Mailbox):
+	("""FIFO mailbox, holding at most maxsize messages if maxsize is given. """
+	 """Messages that don't fit are subject to the overflow policy, which is one of """
+	 """BLOCK, REJECT, DROP_NEWEST, DROP_OLDEST or a callable that is called as """
+	 """overflow(mailbox, message) instead of enqueuing the message. """
+	 """System messages are never blocked or dropped.""")
+	def __init__(self, maxsize=None, overflow=BLOCK):
+		super().__init__(maxsize=maxsize, overflow=overflow)
+		self._system = set() # ids of the system messages in the queue
+		self._not_full = gevent.event.Event()
+		self._not_full.set()
+
+	def put(self, item):
+		if self.full():
+			if not self._overflow(item):
+				return
+		self._push(item)
+
+	_push = gevent.queue.Queue.put
+
+	def put_system(self, item):
+		"""Enqueue a control message, regardless of capacity"""
+		self._system.add(id(item))
+		self._push(item)
+
+	def get(self, block=True, timeout=None):
+		item = super().get(block, timeout)
+		if self.capacity is not None:
+			self._not_full.set()
+		if self._system:
+			self._system.discard(id(item))
+		return item
+
+	def full(self):
+		"""Return True if a message put now would be subject to the overflow policy"""
+		return self.capacity is not None and self.qsize() >= self.capacity
+
+	def take(self, predicate):
+		taken = super().take(predicate)
+		if taken and self.capacity is not None:
+			self._not_full.set()
+		for item in taken:
+			self._system.discard(id(item))
+		return taken
+
+	def _overflow(self, item):
+		"""Apply the overflow policy, return True if item is to be enqueued"""
+		if self.overflow is BLOCK:
+			self.stats["blocked"] += 1
+			while self.qsize() >= self.capacity:
+				self._not_full.clear()
+				self._not_full.wait()
+			return True
+		elif self.overflow is REJECT:
+			self.stats["rejected"] += 1
+			raise MailboxFullError
+		elif self.overflow is DROP_OLDEST:
+			victim = self._evict()
+			if victim is not None:
+				self.stats["dropped_oldest"] += 1
+				self._discard(victim)
+				return True
+			self.stats["dropped_newest"] += 1
+			self._discard(item)
+			return False
+		elif self.overflow is DROP_NEWEST:
+			self.stats["dropped_newest"] += 1
+			self._discard(item)
+			return False
+		else:
+			self.stats["callback"] += 1
+			self.overflow(self, item)
+			return False
+
+	def _evict(self):
+		"""Remove and return the oldest message that is not a system message"""
+		for item in self.queue:
+			if id(item) not in self._system:
+				self.queue.remove(item)
+				return item
+
+	def _discard(self, item):
+		cancel = getattr(item, "cancel", None)
+		if cancel:
+			cancel()
+
+
+class PriorityMailbox(BoundedMailbox, gevent.queue.PriorityQueue):
+	("""Mailbox that hands out system messages (stop, ping) first, then messages """
+	 """by descending priority and in FIFO order among equal priorities. """
+	 """Note that stop() no longer waits for queued messages to be processed: asked tasks """
+	 """that are still queued fail with ActorStoppedError, told messages stay in the mailbox """
+	 """until the actor is started or cleared.""")
+	def __init__(self, maxsize=None, overflow=BLOCK):
+		super().__init__(maxsize=maxsize, overflow=overflow)
+		self._sequence = itertools.count()
+
+	def _push(self, item):
+		gevent.queue.PriorityQueue.put(self, (1, -item.priority, next(self._sequence), item))
+
+	def put_system(self, item):
+		"""Enqueue a control message into the express lane, regardless of capacity"""
+		gevent.queue.PriorityQueue.put(self, (0, 0, next(self._sequence), item))
+
+	def get(self, block=True, timeout=None):
+		return super().get(block, timeout)[-1]
+
+	def take(self, predicate):
+		"""Remove and return the messages for which predicate is true, in order, keeping the others"""
+		taken, kept = [], []
+		for entry in self.queue:
+			(taken if predicate(entry[-1]) else kept).append(entry)
+		if taken:
+			heapq.heapify(kept)
+			self.queue = kept
+			if self.capacity is not None:
+				self._not_full.set()
+		return [entry[-1] for entry in sorted(taken)]
+
+	def _evict(self):
+		"""Remove and return the oldest message that is not a system message"""
+		entries = [entry for entry in self.queue if entry[0] == 1]
+		if entries:
+			oldest = min(entries, key=lambda entry: entry[2])
+			self.queue.remove(oldest)
+			heapq.heapify(self.queue)
+			return oldest[-1]
@@ -0,0 +1,136 @@
+import pickle
+import time
+from collections import Counter, OrderedDict
+from arago.actors.actor import Task
+from arago.actors.symbols import INVALIDATE, INVALIDATE_ALL
+
+_missing = object()
+
+
+class ResultCache(object):
+	("""LRU cache of results by key, holding at most max_entries results and, if max_bytes """
+	 """is given, at most max_bytes of pickled results. Results are forgotten ttl seconds """
+	 """after they were stored, if ttl is given. Counts hits, misses, evictions (to make """
+	 """room), expirations and invalidations in stats.""")
+	def __init__(self, max_entries=1024, max_bytes=None, ttl=None):
+		self._entries = OrderedDict()
+		self._max_entries = max_entries
+		self._max_bytes = max_bytes
+		self._ttl = ttl
+		self.bytes = 0
+		self.stats = Counter()
+
+	def __len__(self):
+		return len(self._entries)
+
+	def __contains__(self, key):
+		return self.get(key, _missing, count=False) is not _missing
+
+	def get(self, key, default=None, count=True):
+		"""Return the result cached for key, default if there is none"""
+		try:
+			value, expires, size = self._entries[key]
+		except KeyError:
+			if count:
+				self.stats["misses"] += 1
+			return default
+		if expires is not None and time.monotonic() > expires:
+			self._remove(key)
+			self.stats["expired"] += 1
+			if count:
+				self.stats["misses"] += 1
+			return default
+		self._entries.move_to_end(key)
+		if count:
+			self.stats["hits"] += 1
+		return value
+
+	def put(self, key, value):
+		"""Cache value for key, unless it doesn't fit at all"""
+		size = 0
+		if self._max_bytes is not None:
+			try:
+				size = len(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+			except Exception:
+				return
+			if size > self._max_bytes:
+				return
+		if key in self._entries:
+			self._remove(key)
+		expires = time.monotonic() + self._ttl if self._ttl is not None else None
+		self._entries[key] = (value, expires, size)
+		self.bytes += size
+		while self._entries and (len(self._entries) > self._max_entries or
+		                         self._max_bytes is not None and self.bytes > self._max_bytes):
+			self._remove(next(iter(self._entries)))
+			self.stats["evictions"] += 1
+
+	def invalidate(self, key):
+		"""Forget the result cached for key, return True if there was one"""
+		if key in self._entries:
+			self._remove(key)
+			self.stats["invalidations"] += 1
+			return True
+		return False
+
+	def clear(self):
+		self.stats["invalidations"] += len(self._entries)
+		self._entries.clear()
+		self.bytes = 0
+
+	def _remove(self, key):
+		value, expires, size = self._entries.pop(key)
+		self.bytes -= size
+
+	def __str__(self):
+		return "<ResultCache, {n} entries, {b} bytes>".format(n=len(self._entries), b=self.bytes)
+
+
+class Memoizing(object):
+	("""Mixin for actors whose handle() is a pure function of message and payload, use as """
+	 """class MyActor(Memoizing, Actor). The results of asked tasks are cached by """
+	 """cache_key(msg, payload), (msg, payload) by default, and tasks whose result is cached """
+	 """are completed without calling handle(). Failures, told messages and tasks with """
+	 """unhashable keys are not cached. See ResultCache for cache_size, cache_bytes and """
+	 """cache_ttl. Send INVALIDATE with a key as payload, or INVALIDATE_ALL, to forget results. """
+	 """The cache is cleared along with the context when the actor is restarted, unless """
+	 """keep_cache is set. A custom handle_batch() bypasses the cache.""")
+	def __init__(self, *args, cache_key=None, cache_size=1024, cache_bytes=None, cache_ttl=None, keep_cache=False, **kwargs):
+		self._cache_key = cache_key if callable(cache_key) else lambda msg, payload: (msg, payload)
+		self._keep_cache = keep_cache
+		self.cache = ResultCache(max_entries=cache_size, max_bytes=cache_bytes, ttl=cache_ttl)
+		super().__init__(*args, **kwargs)
+
+	@property
+	def cache_stats(self):
+		"""Number of cache hits, misses, evictions, expirations and invalidations"""
+		return self.cache.stats
+
+	def _handle(self, task):
+		if task.msg is INVALIDATE:
+			task.set(self.cache.invalidate(task.payload))
+			return task
+		elif task.msg is INVALIDATE_ALL:
+			self.cache.clear()
+			task.set(True)
+			return task
+		elif not isinstance(task, Task):
+			return super()._handle(task)
+		try:
+			key = self._cache_key(task.msg, task.payload)
+			value = self.cache.get(key, _missing)
+		except TypeError:
+			return super()._handle(task)
+		if value is not _missing:
+			self._logger.trace("{me} found the result of {task} in its cache".format(me=self, task=task))
+			task.set(value)
+			return task
+		super()._handle(task)
+		if task.ready() and task.successful():
+			self.cache.put(key, task.value)
+		return task
+
+	def clear(self):
+		super().clear()
+		if not self._keep_cache:
+			self.cache.clear()
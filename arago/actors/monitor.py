@@ -1,5 +1,7 @@
 import gevent
+import gevent.event
 import gevent.hub
+import gevent.pool
 import signal
 from functools import partial
 from arago.actors.actor import Actor
@@ -24,11 +26,62 @@ DEPLETE = ExitPolicy("DEPLETE") # if the last child stops, stop yourself
 SHUTDOWN = ExitPolicy("SHUTDOWN") # shutdown crashed children
 SHUTDOWN_ALL = ExitPolicy("SHUTDOWN_ALL") # shutdown all children
 
+class ChildRegistry(object):
+	("""The children of a Monitor in the order they were registered. Adding, removing and """
+	 """finding a child take O(1). Iterating and indexing use a snapshot that is taken on """
+	 """first use after a change, so children may come and go while iterating.""")
+	def __init__(self):
+		self._children = {}
+		self._snapshot = ()
+
+	def append(self, child):
+		self._children[child] = None
+		self._snapshot = None
+
+	def remove(self, child):
+		try:
+			del self._children[child]
+		except KeyError:
+			raise ValueError("{ch} is not registered".format(ch=child))
+		self._snapshot = None
+
+	def _items(self):
+		if self._snapshot is None:
+			self._snapshot = tuple(self._children)
+		return self._snapshot
+
+	def __contains__(self, child):
+		return child in self._children
+
+	def __len__(self):
+		return len(self._children)
+
+	def __bool__(self):
+		return bool(self._children)
+
+	def __iter__(self):
+		return iter(self._items())
+
+	def __reversed__(self):
+		return reversed(self._items())
+
+	def __getitem__(self, index):
+		if index == -1 and self._snapshot is None:
+			return next(reversed(self._children))
+		return self._items()[index]
+
 class Monitor(Actor):
-	def __init__(self, name=None, policy=RESTART, max_restarts=None, timeframe=None, children=None, *args, **kwargs):
+	("""Supervises its children according to policy. stop() stops the children one after """
+	 """the other, or up to stop_concurrency of them at the same time (None: all at once), """
+	 """and returns once all of them have unregistered.""")
+	def __init__(self, name=None, policy=RESTART, max_restarts=None, timeframe=None, children=None, stop_concurrency=1, *args, **kwargs):
 		super().__init__(name=name, *args, **kwargs)
 		self._policy = policy
-		self._children = []
+		self._children = ChildRegistry()
+		self._no_children = gevent.event.Event()
+		self._no_children.set()
+		self._stopping = False
+		self._stop_concurrency = stop_concurrency
 		[self.register_child(child) for child in children] if children else None
 
 	def _kill(self):
@@ -84,9 +137,13 @@ class Monitor(Actor):
 		if isinstance(child, partial):
 			child = child()
 		self._children.append(child)
+		self._no_children.clear()
 		#child.link(self._handle_child_exit)
 		child.register_parent(self)
 		self._logger.debug("{ch} registered as child of {me}.".format(ch=child, me=self))
+		if self._stopping:
+			self._logger.debug("{me} is stopping, stopping {ch} right away.".format(ch=child, me=self))
+			child.stop()
 
 	def unregister_child(self, child):
 		"""Unregister a running Actor from the list of children"""
@@ -94,6 +151,8 @@ class Monitor(Actor):
 		try:
 			self._children.remove(child)
 			self._logger.debug("{ch} unregistered as child of {me}.".format(ch=child, me=self))
+			if not self._children:
+				self._no_children.set()
 		except ValueError:
 			self._logger.debug("Unregistering {ch} as child of {me} failed.".format(ch=child, me=self))
 
@@ -106,13 +165,23 @@ class Monitor(Actor):
 		[child.restart() for child in list(self._children)]
 		super().restart()
 
+	def start(self):
+		self._stopping = False
+		super().start()
+
 	def stop(self):
 		self._policy = SHUTDOWN
+		self._stopping = True
 		self._logger.debug("{me} is in controlled shutdown, changing restart policy to {pol}".format(me=self, pol=self._policy))
-		for child in list(self._children):
-			child.stop()
-		while len(self._children) > 0:
-			gevent.idle()
+		if self._stop_concurrency == 1:
+			for child in self._children:
+				child.stop()
+		else:
+			pool = gevent.pool.Pool(self._stop_concurrency)
+			for child in self._children:
+				pool.spawn(child.stop)
+			pool.join()
+		self._no_children.wait()
 		self._logger.debug("All children of {me} unregistered.".format(me=self))
 		super().stop()
 
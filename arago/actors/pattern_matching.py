@@ -1,5 +1,6 @@
 import function_pattern_matching as fpm
 from function_pattern_matching import eq, ne, lt, le, gt, ge, Is, Isnot, isoftype, isiterable, eTrue, eFalse, In, notIn, _
+import inspect
 
 ANYTHING = object()
 
@@ -10,7 +11,9 @@ def match(**kwargs):
 		case_kwargs = {key:fpm.eq(val) for key, val in case_kwargs.items()}
 		guard_kwargs.update(case_kwargs)
 		case_kwargs = {}
+	literals = {k:v for k,v in kwargs.items() if not isinstance(v, fpm.GuardFunc) and v is not _}
 	def decorator(decoratee):
+		decoratee._match_literals = literals
 		return (
 			fpm.case(**case_kwargs)(fpm.guard(**guard_kwargs)(decoratee))
 			if guard_kwargs
@@ -62,3 +65,75 @@ def item(item, value=None, operation=None):
 		except KeyError:
 			return False
 	return fpm.GuardFunc(wrapper)
+
+class Dispatcher(object):
+	("""Compiled form of a MultiFunc for calls with a fixed number of positional arguments. """
+	 """Clauses that match the argument at position index against a literal (as in """
+	 """@match(msg="...")) are looked up in a hash table, only the remaining clauses """
+	 """are tried one after the other. Clauses matching nothing but literals are called """
+	 """without going through their guards. The first matching clause still wins.""")
+	def __init__(self, multifunc, arity=4, index=1):
+		self._index = index
+		self._size = len(multifunc.clauses[arity])
+		self._clauses = [self._compile(clause, index) for clause in multifunc.clauses[arity]]
+		self._linear = [self._compile(clause, None) for clause in multifunc.clauses[arity]]
+		unindexed = [clause for clause in self._clauses if clause[0] is _]
+		keys = {clause[0] for clause in self._clauses if clause[0] is not _}
+		self._table = {
+			key: [clause for clause in self._clauses if clause[0] is _ or clause[0] == key]
+			for key in keys
+		}
+		self._fallback = unindexed
+
+	@staticmethod
+	def _compile(clause, index):
+		"""Return (key, literals, function, guarded) for clause"""
+		function = getattr(clause, "__guarded__", clause)
+		literals = getattr(clause, "_match_literals", {})
+		names = list(inspect.signature(function).parameters)
+		positions = {name: pos for pos, name in enumerate(names)}
+		key = _
+		if index is not None and index < len(names) and names[index] in literals:
+			try:
+				hash(literals[names[index]])
+				key = literals[names[index]]
+			except TypeError:
+				pass
+		guards = getattr(clause, "_argument_guards", {})
+		only_literals = (
+			getattr(clause, "_relguard", _) is _
+			and all(name in literals for name, grd in guards.items() if grd is not _)
+			and all(name in positions for name in literals)
+		)
+		if not hasattr(clause, "__guarded__"):
+			return (key, (), function, False)
+		elif only_literals:
+			checks = tuple((positions[name], value) for name, value in literals.items() if positions[name] != index or key is _)
+			return (key, checks, function, False)
+		else:
+			return (key, None, clause, True)
+
+	def __call__(self, *args):
+		try:
+			candidates = self._table.get(args[self._index], self._fallback)
+		except TypeError:
+			candidates = self._linear
+		for key, checks, function, guarded in candidates:
+			if guarded:
+				try:
+					return function(*args)
+				except fpm.GuardError:
+					continue
+			for pos, value in checks:
+				if not args[pos] == value:
+					break
+			else:
+				return function(*args)
+		raise fpm.MatchError("No match for given argument values")
+
+def compiled(multifunc, arity=4, index=1):
+	"""Return the (cached) Dispatcher for multifunc"""
+	dispatcher = getattr(multifunc, "_dispatcher", None)
+	if dispatcher is None or dispatcher._size != len(multifunc.clauses[arity]):
+		dispatcher = multifunc._dispatcher = Dispatcher(multifunc, arity=arity, index=index)
+	return dispatcher
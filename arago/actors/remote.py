@@ -0,0 +1,235 @@
+import gevent, gevent.queue, gevent.socket
+import itertools
+import logging
+import pickle
+import socket
+import struct
+import time
+
+from urllib.parse import urlparse
+from arago.actors.actor import Task, ActorStoppedError, TaskExpiredError
+
+# Frame kinds
+TELL = 1
+ASK = 2
+REPLY = 3
+ERROR = 4
+
+
+class RemoteConnectionError(Exception):
+	__str__ = lambda x: "RemoteConnectionError"
+
+
+class UnknownActorError(Exception):
+	__str__ = lambda x: "UnknownActorError"
+
+
+class RemoteError(Exception):
+	"""Stands in for a remote exception or result that could not be pickled"""
+
+
+def parse_address(address):
+	"""Return (family, address) for tcp://host:port or unix:///path"""
+	url = urlparse(address)
+	if url.scheme == "unix":
+		return socket.AF_UNIX, url.path
+	elif url.scheme == "tcp":
+		return socket.AF_INET, (url.hostname, url.port)
+	raise ValueError("Unsupported address {addr}, use tcp://host:port or unix:///path".format(addr=address))
+
+
+class Channel(object):
+	("""Exchanges frames over a stream socket. A frame is a header (body length, kind, request id) """
+	 """followed by a pickled body. Frames to send are queued and written by a writer greenlet, """
+	 """so that frames sent in quick succession share one sendall(). Received frames are passed """
+	 """to on_frame(kind, request_id, body) by run(), which returns when the connection is closed. """
+	 """Bodies are pickled, so only ever connect to peers you trust.""")
+	_header = struct.Struct("!IBI")
+
+	def __init__(self, sock, on_frame, on_close=None):
+		self._logger = logging.getLogger('root')
+		self._socket = sock
+		self._on_frame = on_frame
+		self._on_close = on_close
+		self._outbox = gevent.queue.Queue()
+		self._writer = gevent.spawn(self._write_loop)
+		self.closed = False
+
+	def send(self, kind, request_id, body):
+		data = pickle.dumps(body, protocol=pickle.HIGHEST_PROTOCOL)
+		self._outbox.put(self._header.pack(len(data), kind, request_id) + data)
+
+	def _write_loop(self):
+		try:
+			for frame in self._outbox:
+				frames = [frame]
+				while len(self._outbox) > 0 and len(frames) < 256:
+					frames.append(self._outbox.get_nowait())
+				self._socket.sendall(b"".join(frames))
+		except OSError as err:
+			self._logger.debug("Writing to {peer} failed with {err}".format(peer=self._peer(), err=err))
+			self.close()
+
+	def run(self):
+		header = self._header
+		buffer = bytearray()
+		try:
+			while True:
+				data = self._socket.recv(1 << 16)
+				if not data:
+					break
+				buffer += data
+				start = 0
+				while len(buffer) - start >= header.size:
+					size, kind, request_id = header.unpack_from(buffer, start)
+					end = start + header.size + size
+					if len(buffer) < end:
+						break
+					body = pickle.loads(buffer[start + header.size:end])
+					start = end
+					self._on_frame(kind, request_id, body)
+				del buffer[:start]
+		except OSError as err:
+			self._logger.debug("Reading from {peer} failed with {err}".format(peer=self._peer(), err=err))
+		finally:
+			self.close()
+
+	def _peer(self):
+		try:
+			return self._socket.getpeername()
+		except OSError:
+			return "closed socket"
+
+	def close(self):
+		if not self.closed:
+			self.closed = True
+			self._writer.kill(block=False)
+			self._socket.close()
+			if self._on_close:
+				self._on_close()
+
+
+class RemoteConnection(object):
+	("""Persistent connection to a RemoteSource, shared by all ActorRefs for its address. """
+	 """Any number of asks can be in flight, replies are matched by request id. """
+	 """If the connection breaks, pending asks fail with RemoteConnectionError and the """
+	 """next message reconnects.""")
+	def __init__(self, address, connect_timeout=5):
+		self._logger = logging.getLogger('root')
+		self.address = address
+		self._connect_timeout = connect_timeout
+		self._channel = None
+		self._pending = {}
+		self._ids = itertools.count()
+
+	def _connect(self):
+		family, address = parse_address(self.address)
+		sock = gevent.socket.socket(family, socket.SOCK_STREAM)
+		try:
+			sock.settimeout(self._connect_timeout)
+			sock.connect(address)
+			sock.settimeout(None)
+			if family != socket.AF_UNIX:
+				sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+		except OSError as err:
+			sock.close()
+			self._logger.warning("Connecting to {addr} failed with {err}".format(addr=self.address, err=err))
+			raise RemoteConnectionError from err
+		channel = Channel(sock, self._on_frame, on_close=lambda: self._on_close(channel))
+		gevent.spawn(channel.run)
+		self._logger.debug("Connected to {addr}".format(addr=self.address))
+		return channel
+
+	def send(self, kind, target, msg, payload=None, priority=0, task=None, deadline=None):
+		if self._channel is None or self._channel.closed:
+			self._channel = self._connect()
+		request_id = 0
+		if task is not None:
+			request_id = next(self._ids) % 0xFFFFFFFF + 1
+			self._pending[request_id] = task
+			task.rawlink(lambda task, request_id=request_id: self._pending.pop(request_id, None)) # e.g. canceled, the reply is ignored
+		try:
+			# Clocks differ between hosts, so a deadline travels as the time left until then
+			timeout = None if deadline is None else deadline - time.monotonic()
+			self._channel.send(kind, request_id, (target, msg, payload, priority, timeout))
+		except Exception:
+			self._pending.pop(request_id, None)
+			raise
+
+	def _on_frame(self, kind, request_id, body):
+		task = self._pending.pop(request_id, None)
+		if task is None or task.ready():
+			return
+		elif kind == REPLY:
+			task.set(body)
+		else:
+			task.set_exception(body)
+
+	def _on_close(self, channel):
+		if channel is self._channel:
+			self._channel = None
+		pending, self._pending = self._pending, {}
+		for task in pending.values():
+			task.set_exception(RemoteConnectionError())
+		self._logger.debug("Connection to {addr} closed, {n} pending asks failed".format(addr=self.address, n=len(pending)))
+
+	def close(self):
+		if self._channel:
+			self._channel.close()
+
+
+class ConnectionPool(object):
+	"""Hands out up to size persistent connections per address, round-robin"""
+	def __init__(self, size=1):
+		self._size = size
+		self._connections = {}
+
+	def get(self, address):
+		connections = self._connections.get(address)
+		if connections is None:
+			connections = self._connections[address] = itertools.cycle(
+				[RemoteConnection(address) for i in range(self._size)])
+		return next(connections)
+
+default_pool = ConnectionPool()
+
+
+class ActorRef(object):
+	("""Refers to the actor registered as name with the RemoteSource listening on address """
+	 """(tcp://host:port or unix:///path) and offers the same tell/ask/wait_for API as Actor. """
+	 """Messages, payloads and results are pickled, senders are not transmitted.""")
+	def __init__(self, address, name, pool=None):
+		self.address = address
+		self.name = name
+		self._pool = pool or default_pool
+
+	def __str__(self):
+		return "<{type} \"{name}\" at {addr}>".format(type=type(self).__name__, name=self.name, addr=self.address)
+
+	def tell(self, msg, payload=None, sender=None, priority=0, deadline=None):
+		"""Send a message, get nothing (fire-and-forget)."""
+		self._pool.get(self.address).send(TELL, self.name, msg, payload, priority, deadline=deadline)
+
+	def ask(self, msg, payload=None, sender=None, priority=0, deadline=None):
+		"""Send a message, get a future."""
+		task = Task(msg, payload, sender, priority, deadline)
+		self._pool.get(self.address).send(ASK, self.name, msg, payload, priority, task=task, deadline=deadline)
+		return task
+
+	def wait_for(self, msg, payload=None, sender=None, timeout=None, retry=1, priority=0, deadline=None):
+		"""Send a message, get a result.
+		An ask that timed out is canceled and its reply ignored, the remote actor drops it if it is still queued at the deadline."""
+		for it in range(retry):
+			expires = deadline
+			if timeout is not None:
+				expires = time.monotonic() + timeout if deadline is None else min(deadline, time.monotonic() + timeout)
+			task = None
+			try:
+				task = self.ask(msg, payload=payload, sender=sender, priority=priority, deadline=expires)
+				return task.get(timeout=timeout)
+			except (ActorStoppedError, TaskExpiredError, RemoteConnectionError, gevent.Timeout) as exc:
+				if task is not None:
+					task.cancel()
+				last_exc = exc
+				continue
+		raise last_exc
@@ -1,6 +1,7 @@
 import gevent
 from arago.actors.monitor import Monitor
 from arago.actors.actor import Task, ActorStoppedError
+from arago.actors.mailbox import MailboxFullError
 
 class Router(Monitor):
 	def _route(self, msg):
@@ -17,6 +18,9 @@ class Router(Monitor):
 			gevent.idle()
 			self._logger.trace("{me} has failed to route {task} to {target} because {target} is stopped".format(me=self, task=task, target=target))
 			task.set_exception(e)
+		except MailboxFullError as e:
+			self._logger.trace("{me} has failed to route {task} to {target} because the mailbox of {target} is full".format(me=self, task=task, target=target))
+			task.set_exception(e)
 		except Exception as e:
 			gevent.idle()
 			self._logger.trace("{me} has failed to route {task}: Determining target failed with {err}".format(me=self, task=task, err=e))
@@ -1 +1 @@
-from arago.actors.routers.broadcast.broadcast_router import BroadcastRouter
+from arago.actors.routers.broadcast.broadcast_router import BroadcastRouter, ALL, QUORUM
@@ -1,7 +1,101 @@
-from arago.actors import Router
+import gevent
+from arago.actors import Router, Task, ActorStoppedError, MailboxFullError
+
+class GatherPolicy(object):
+	def __init__(self, identifier):
+		self.__ident__ = identifier
+	def __str__(self):
+		return self.__ident__
+
+ALL = GatherPolicy("ALL") # wait for the results of all children
+QUORUM = GatherPolicy("QUORUM") # wait for the results of a majority of children
+
+
+class Gathering(object):
+	("""Resolves a broadcast task with the list of its sub-tasks' results, in the order they """
+	 """arrived, as soon as needed of them have succeeded or timeout seconds have passed. """
+	 """If too many sub-tasks fail to reach needed results, the task fails with the last error. """
+	 """Once the task is resolved (or canceled), the remaining sub-tasks are canceled.""")
+	def __init__(self, task, subtasks, needed, timeout=None):
+		self.task = task
+		self.results = []
+		self._subtasks = subtasks
+		self._needed = needed
+		self._pending = len(subtasks)
+		self._error = None
+		self._timer = None
+		if timeout is not None:
+			self._timer = gevent.get_hub().loop.timer(timeout)
+			self._timer.start(self._expired)
+		task.rawlink(self._finished)
+		for subtask in subtasks:
+			subtask.rawlink(self._collect)
+		if needed == 0:
+			task.set(self.results)
+
+	def _collect(self, subtask):
+		self._pending -= 1
+		if self.task.ready():
+			return
+		if subtask.successful():
+			self.results.append(subtask.value)
+		else:
+			self._error = subtask.exception
+		if len(self.results) >= self._needed:
+			self.task.set(self.results)
+		elif len(self.results) + self._pending < self._needed:
+			self.task.set_exception(self._error)
+
+	def _expired(self):
+		if not self.task.ready():
+			self.task.set(list(self.results))
+
+	def _finished(self, task):
+		if self._timer is not None:
+			self._timer.close()
+			self._timer = None
+		for subtask in self._subtasks:
+			if not subtask.ready():
+				subtask.cancel()
+
 
 class BroadcastRouter (Router):
-	"""Routes received messages to all children"""
+	("""Routes received messages to all children. Each child gets its own copy of an asked """
+	 """task and the task resolves to the list of the children's results, in the order they """
+	 """arrived. gather determines how many results are awaited: ALL, QUORUM (a majority) """
+	 """or a number n for the first n results. With timeout, the task resolves to the results """
+	 """that arrived within timeout seconds. Sub-tasks still pending then are canceled.""")
+	def __init__(self, name=None, gather=ALL, timeout=None, *args, **kwargs):
+		self._gather = gather
+		self._timeout = timeout
+		super().__init__(name=name, *args, **kwargs)
+
+	def _needed(self, children):
+		if self._gather is ALL:
+			return children
+		elif self._gather is QUORUM:
+			return children // 2 + 1 if children else 0
+		return min(self._gather, children)
+
 	def _forward(self, task):
-		for target in self._children:
+		if not isinstance(task, Task):
+			for target in list(self._children):
+				self._deliver(target, task)
+			return task
+		subtasks = []
+		for target in list(self._children):
+			subtask = Task(task.msg, task.payload, task.sender, task.priority, task.deadline)
+			self._deliver(target, subtask)
+			subtasks.append(subtask)
+		Gathering(task, subtasks, self._needed(len(subtasks)), timeout=self._timeout)
+		return task
+
+	def _deliver(self, target, task):
+		try:
 			target._enqueue(task)
+		except ActorStoppedError as e:
+			self._logger.trace("{me} has failed to route {task} to {target} because {target} is stopped".format(me=self, task=task, target=target))
+			task.set_exception(e)
+		except MailboxFullError as e:
+			self._logger.trace("{me} has failed to route {task} to {target} because the mailbox of {target} is full".format(me=self, task=task, target=target))
+			task.set_exception(e)
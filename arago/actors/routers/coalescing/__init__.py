@@ -0,0 +1 @@
+from arago.actors.routers.coalescing.coalescing_router import CoalescingRouter
@@ -0,0 +1,79 @@
+from arago.actors import Task
+from arago.actors.routers.shortest_queue.shortest_queue_router import ShortestQueueRouter
+from functools import partial
+
+
+class Flight(object):
+	"""An asked task forwarded on behalf of all tasks with the same key that arrive while it is in flight"""
+	__slots__ = ("task", "waiters")
+
+	def __init__(self, task):
+		self.task = task
+		self.waiters = []
+
+	def join(self, waiter):
+		self.waiters.append(waiter)
+		if self.task.deadline is not None:
+			self.task.deadline = None if waiter.deadline is None else max(self.task.deadline, waiter.deadline)
+
+
+class CoalescingRouter(ShortestQueueRouter):
+	("""Applies mapfunc to each asked task and forwards only one of the tasks with equal """
+	 """keys that are in flight at the same time to the least loaded child. All of them """
+	 """resolve to the result (or exception) of that one task, and the key is forgotten """
+	 """as soon as the result is delivered. Without mapfunc, tasks with equal message and """
+	 """payload are coalesced. Told messages and tasks with unhashable keys are routed as """
+	 """usual. The forwarded task is canceled once all of its waiters are canceled.""")
+	def __init__(self, name=None, mapfunc=None, *args, **kwargs):
+		self._map = mapfunc if callable(mapfunc) else lambda task: (task.msg, task.payload)
+		self._flights = {}
+		super().__init__(name=name, *args, **kwargs)
+
+	def _forward(self, task):
+		if not isinstance(task, Task):
+			return super()._forward(task)
+		try:
+			key = self._map(task)
+			flight = self._flights.get(key)
+		except TypeError:
+			return super()._forward(task)
+		if flight is None or flight.task.ready():
+			flight = self._flights[key] = Flight(Task(task.msg, task.payload, task.sender, task.priority, task.deadline))
+			flight.task.rawlink(partial(self._land, key, flight))
+			flight.join(task)
+			task.rawlink(partial(self._abandoned, flight))
+			try:
+				forwarded = super()._forward(flight.task)
+			except Exception as err:
+				self._ground(key, flight, err)
+				raise
+			if forwarded is None:
+				self._ground(key, flight, IndexError("{me} has no child to forward {task} to".format(me=self, task=flight.task)))
+		else:
+			self._logger.trace("{me} coalesced {task} with the one in flight for {key}".format(me=self, task=task, key=key))
+			flight.join(task)
+			task.rawlink(partial(self._abandoned, flight))
+		return task
+
+	def _land(self, key, flight, result):
+		if self._flights.get(key) is flight:
+			del self._flights[key]
+		for waiter in flight.waiters:
+			if waiter.ready():
+				continue
+			elif result.successful():
+				waiter.set(result.value)
+			else:
+				waiter.set_exception(result.exception)
+
+	def _ground(self, key, flight, err):
+		"""Forget a flight that could not be forwarded and fail its waiters"""
+		if self._flights.get(key) is flight:
+			del self._flights[key]
+		if not flight.task.ready():
+			flight.task.set_exception(err)
+
+	def _abandoned(self, flight, waiter):
+		if waiter.canceled and not flight.task.ready() and all(waiter.canceled for waiter in flight.waiters):
+			self._logger.trace("{me} cancels {task}, nobody waits for it any more".format(me=self, task=flight.task))
+			flight.task.cancel()
@@ -1 +1 @@
-from arago.actors.routers.consistent_hashing.consistent_hashing_router.py import ConsistentHashingRouter
+from arago.actors.routers.consistent_hashing.consistent_hashing_router import ConsistentHashingRouter
@@ -1,21 +1,78 @@
 from arago.actors import Router
+from collections import OrderedDict
 from uhashring import HashRing
+import math
 
 class ConsistentHashingRouter(Router):
 	("""Applies mapfunc to each message and based on the result, """
-	 """routes equal messages to always the same child""")
-	def __init__(self, name=None, mapfunc=None, *args, **kwargs):
+	 """routes equal messages to always the same child. """
+	 """If epsilon is given, no child is handed a message while its load is at """
+	 """(1 + epsilon) times the average load, the message goes to the next child on """
+	 """the ring instead (consistent hashing with bounded loads). The children of the """
+	 """last cache_size keys are remembered, so repeated keys skip the hash ring.""")
+	def __init__(self, name=None, mapfunc=None, epsilon=None, cache_size=1024, *args, **kwargs):
 		self._hashring = HashRing()
 		self._map = mapfunc if callable(mapfunc) else lambda msg: msg
+		self._epsilon = epsilon
+		self._cache = OrderedDict()
+		self._cache_size = cache_size
+		self._loads = {}
+		self._total_load = 0
 		super().__init__(name=name, *args, **kwargs)
 
 	def _route(self, msg):
-		return self._hashring.get_node(self._map(msg))
+		key = self._map(msg)
+		child = self._lookup(key)
+		if self._epsilon is not None and child is not None and child.load >= self._bound():
+			child = self._spill(key)
+		return child
+
+	def _lookup(self, key):
+		try:
+			child = self._cache[key]
+			self._cache.move_to_end(key)
+			return child
+		except KeyError:
+			child = self._hashring.get_node(key)
+			if self._cache_size:
+				self._cache[key] = child
+				if len(self._cache) > self._cache_size:
+					self._cache.popitem(last=False)
+			return child
+		except TypeError:
+			return self._hashring.get_node(key)
+
+	def _bound(self):
+		"""Load at which a child takes no more messages, always above the least loaded child's"""
+		return math.ceil((1 + self._epsilon) * (self._total_load + 1) / len(self._loads))
+
+	def _spill(self, key):
+		"""Walk the ring from key's child to the first one below the bound"""
+		bound = self._bound()
+		for child in self._hashring.iterate_nodes(key):
+			if child.load < bound:
+				self._logger.trace("{me} spilled key {key} over to {ch}".format(me=self, key=key, ch=child))
+				return child
+
+	def _child_load_changed(self, child):
+		load = child.load
+		self._total_load += load - self._loads.get(child, load)
+		self._loads[child] = load
 
 	def register_child(self, child):
 		super().register_child(child)
+		child = self._children[-1]
 		self._hashring.add_node(child)
+		self._cache.clear()
+		if self._epsilon is not None:
+			child._report_load = True
+			self._loads[child] = child.load
+			self._total_load += child.load
 
 	def unregister_child(self, child):
 		super().unregister_child(child)
 		self._hashring.remove_node(child)
+		self._cache.clear()
+		if child in self._loads:
+			child._report_load = False
+			self._total_load -= self._loads.pop(child)
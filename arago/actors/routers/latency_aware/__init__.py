@@ -0,0 +1 @@
+from arago.actors.routers.latency_aware.latency_aware_router import LatencyAwareRouter
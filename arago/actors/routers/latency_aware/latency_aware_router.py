@@ -0,0 +1,44 @@
+from arago.actors.routers.power_of_two import PowerOfTwoChoicesRouter
+
+
+class LatencyAwareRouter(PowerOfTwoChoicesRouter):
+	("""Picks two children at random and routes received messages to the one that """
+	 """is expected to finish it first: its load times its moving average of handling """
+	 """times. Children without measurements yet are assumed to take the mean handling time """
+	 """of the measured ones (refreshed every refresh messages), so a cold child is judged """
+	 """by its load and not flooded. alpha is the weight of each new measurement in the """
+	 """moving average.""")
+	def __init__(self, name=None, alpha=0.2, refresh=64, *args, **kwargs):
+		self._alpha = alpha
+		self._refresh = refresh
+		self._routed = 0
+		self._mean_latency = None
+		super().__init__(name=name, *args, **kwargs)
+
+	def _route(self, msg):
+		self._routed += 1
+		if self._routed >= self._refresh:
+			self._routed = 0
+			latencies = [child.latency for child in self._candidates if child.latency is not None]
+			self._mean_latency = sum(latencies) / len(latencies) if latencies else None
+		return super()._route(msg)
+
+	def _cost(self, child):
+		if child._stopped:
+			return float("inf")
+		latency = child.latency
+		if latency is None:
+			latency = self._mean_latency or 1.0
+		elif self._mean_latency is None:
+			self._mean_latency = latency
+		return (child.load + 1) * latency
+
+	def register_child(self, child):
+		super().register_child(child)
+		child = self._children[-1]
+		child._track_latency = True
+		child._latency_alpha = self._alpha
+
+	def unregister_child(self, child):
+		super().unregister_child(child)
+		child._track_latency = False
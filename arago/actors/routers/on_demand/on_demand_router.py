@@ -1,6 +1,8 @@
-from arago.actors import Router, IGNORE
+from arago.actors import Router, IGNORE, ActorStoppedError
+from collections import OrderedDict, deque
+import itertools
+import gevent
 import gevent.lock
-import gc
 import better_exceptions
 import sys
 
@@ -10,35 +12,134 @@ class SpawningChildFailedError(Exception):
 
 
 class OnDemandRouter(Router):
-	"""Spawns new children on demand"""
+	("""Spawns new children on demand, one per target returned by mapfunc. """
+	 """With max_workers, at most that many workers are kept running: spawning another """
+	 """one stops the least recently used idle worker (or the least recently used one, """
+	 """after it has finished its messages, if none is idle). """
+	 """With warm_pool, that many workers are spawned ahead of time with target=None; """
+	 """a new target takes one of them, calling its on_assign(target) if it has one. """
+	 """Messages for a target whose worker is still stopping wait for it in the background """
+	 """and are then handed to a new worker, in order.""")
 	def __init__(self, worker_cls, name=None, worker_name_tpl=None, worker_args_func=None,
 	             policy=IGNORE, max_restarts=None, timeframe=None,
-	             mapfunc=None):
+	             mapfunc=None, max_workers=None, warm_pool=0):
+		if warm_pool and worker_args_func:
+			raise ValueError("A warm pool can't be used with worker_args_func")
 		self._worker_cls = worker_cls
 		self._worker_name_tpl = worker_name_tpl
 		self._worker_args_func = worker_args_func
 		self._map = mapfunc if callable(mapfunc) else lambda msg: id(msg)
-		self._children_map = {}
+		self._max_workers = max_workers
+		self._warm_pool = warm_pool
+		self._pool = deque()
+		self._pool_ids = itertools.count()
+		self._respawning = {}
+		self._children_map = OrderedDict()
 		self._children_map_reverse = {}
+		self._running = set() # mapped workers that were neither evicted nor have stopped
+		self._idle = OrderedDict() # running workers without messages, in the order they became idle
 		self._children_map_lock = gevent.lock.Semaphore()
 		super().__init__(name=name, policy=policy, max_restarts=max_restarts, timeframe=timeframe, children=None)
+		self._fill_pool()
 
 	def _route(self, msg):
 		target = self._map(msg)
-		if target in self._children_map and not self._children_map[target]._stopped:
-			child = self._children_map[target]
+		if target in self._respawning:
+			self._logger.debug("{me} is queueing {msg} until the worker for target {target} is respawned".format(me=self, msg=msg, target=target))
+			self._respawning[target].append(msg)
+			return None
+		child = self._children_map.get(target)
+		if child is not None and not child._stopped:
+			self._children_map.move_to_end(target)
 			self._logger.debug("{me} is re-using existing worker {ch} for target {target}".format(me=self, ch=child, target=target))
-		elif target in self._children_map and self._children_map[target]._stopped:
-			self._logger.debug("{me} is waiting for existing worker {ch} for target {target} to shutdown.".format(me=self, ch=self._children_map[target], target=target))
-			self._children_map[target].join()
-			child = self.spawn_child(target, msg=msg)
-			self._logger.verbose("{me} has spawned new worker {ch} for target {target}".format(me=self, ch=child, target=target))
+		elif child is not None:
+			self._logger.debug("{me} is waiting for existing worker {ch} for target {target} to shutdown.".format(me=self, ch=child, target=target))
+			self._respawning[target] = deque([msg])
+			gevent.spawn(self._respawn, child, target)
+			return None
 		else:
 			child = self.spawn_child(target, msg=msg)
 			self._logger.verbose("{me} has spawned new worker {ch} for target {target}".format(me=self, ch=child, target=target))
 		return child
 
+	def _respawn(self, old, target):
+		"""Wait for the stopping worker of target, then hand the queued messages to a new one"""
+		tasks = self._respawning[target]
+		error = None
+		try:
+			old.join()
+			child = self.spawn_child(target, msg=tasks[0])
+			self._logger.verbose("{me} has spawned new worker {ch} for target {target}".format(me=self, ch=child, target=target))
+			while tasks:
+				task = tasks.popleft()
+				try:
+					child._enqueue(task)
+				except Exception as err:
+					self._logger.trace("{me} has failed to route {task} to {ch}: {err}".format(me=self, task=task, ch=child, err=err))
+					task.set_exception(err)
+		except Exception as err:
+			self._logger.error("{me} has failed to respawn the worker for target {target}: {err}".format(me=self, target=target, err=err))
+			error = err
+		finally:
+			del self._respawning[target]
+			while tasks:
+				tasks.popleft().set_exception(error if error is not None else ActorStoppedError())
+
+	def _evict(self):
+		"""Stop the least recently used worker, preferring idle ones"""
+		if self._max_workers is None or len(self._running) < self._max_workers:
+			return
+		if self._idle:
+			child = self._idle.popitem(last=False)[0]
+		else:
+			child = next((child for child in self._children_map.values() if child in self._running), None)
+			if child is None:
+				return
+		self._logger.debug("{me} is evicting worker {ch} for target {target}".format(me=self, ch=child, target=child._target))
+		self._running.discard(child)
+		child.stop(wait=False)
+
+	def _child_load_changed(self, child):
+		if child.load == 0 and child in self._running:
+			self._idle[child] = None
+		else:
+			self._idle.pop(child, None)
+
+	def _fill_pool(self):
+		while len(self._pool) < self._warm_pool and not self._stopped:
+			name = "{tpl}-pool-{n}".format(tpl=self._worker_name_tpl or str(self._worker_cls), n=next(self._pool_ids))
+			try:
+				child = self._worker_cls(name=name, target=None)
+			except Exception as err:
+				formatted_exc = better_exceptions.format_exception(*sys.exc_info())
+				self._logger.error("Spawning pooled child failed with {e}".format(e=formatted_exc))
+				return
+			child._target = None
+			super().register_child(child)
+			self._pool.append(child)
+
+	def _take_from_pool(self, target):
+		while self._pool:
+			child = self._pool.popleft()
+			if child._stopped:
+				continue
+			child._target = target
+			on_assign = getattr(child, "on_assign", None)
+			if on_assign:
+				on_assign(target)
+			gevent.spawn(self._fill_pool)
+			return child
+
 	def spawn_child(self, target, name=None, msg=None):
+		self._evict()
+		child = self._take_from_pool(target)
+		if child is not None:
+			self._logger.debug("{me} has taken {ch} from the pool for target {target}".format(me=self, ch=child, target=target))
+			with self._children_map_lock:
+				self._children_map[target] = child
+				self._running.add(child)
+			child._report_load = self._max_workers is not None
+			return child
 		if not name:
 			name = "{tpl}-{target}".format(tpl = self._worker_name_tpl or str(self._worker_cls), target=target)
 		try:
@@ -56,13 +157,28 @@ class OnDemandRouter(Router):
 		super().register_child(child)
 		with self._children_map_lock:
 			self._children_map[target] = child
+			self._running.add(child)
+		child._report_load = self._max_workers is not None
 
 	def unregister_child(self, child):
 		with self._children_map_lock:
 			target = child._target
-			try:
-				super().unregister_child(child)
+			super().unregister_child(child)
+			self._running.discard(child)
+			self._idle.pop(child, None)
+			child._report_load = False
+			if child in self._pool:
+				self._pool.remove(child)
+			elif self._children_map.get(target) is child:
 				del self._children_map[target]
-				gc.collect()
-			except KeyError:
+			else:
 				self._logger.debug("{me} failed to unregister {ch}: Not registered (any more?)".format(me=self, ch=child))
+
+	def _handle_child(self, child, state):
+		self._running.discard(child)
+		self._idle.pop(child, None)
+		super()._handle_child(child, state)
+		if not child._stopped and self._children_map.get(child._target) is child:
+			self._running.add(child)
+			if child._report_load:
+				self._child_load_changed(child)
@@ -0,0 +1 @@
+from arago.actors.routers.power_of_two.power_of_two_router import PowerOfTwoChoicesRouter
@@ -0,0 +1,39 @@
+from arago.actors import Router
+import random
+
+
+class PowerOfTwoChoicesRouter(Router):
+	("""Picks two children at random and routes received messages to the one """
+	 """with the lower load (waiting messages plus the one being handled)""")
+	def __init__(self, name=None, *args, **kwargs):
+		self._candidates = []
+		self._positions = {}
+		super().__init__(name=name, *args, **kwargs)
+
+	def _cost(self, child):
+		return float("inf") if child._stopped else child.load
+
+	def _route(self, msg):
+		candidates = self._candidates
+		if len(candidates) < 2:
+			return candidates[0] if candidates else None
+		i = random.randrange(len(candidates))
+		j = random.randrange(len(candidates) - 1)
+		first, second = candidates[i], candidates[j + 1 if j >= i else j]
+		return first if self._cost(first) <= self._cost(second) else second
+
+	def register_child(self, child):
+		super().register_child(child)
+		child = self._children[-1]
+		if child not in self._positions:
+			self._positions[child] = len(self._candidates)
+			self._candidates.append(child)
+
+	def unregister_child(self, child):
+		super().unregister_child(child)
+		position = self._positions.pop(child, None)
+		if position is not None:
+			last = self._candidates.pop()
+			if last is not child:
+				self._candidates[position] = last
+				self._positions[last] = position
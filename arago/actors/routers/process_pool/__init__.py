@@ -0,0 +1 @@
+from arago.actors.routers.process_pool.process_pool_router import ProcessPoolRouter, WorkerProcess, WorkerCrashedError
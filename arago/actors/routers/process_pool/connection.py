@@ -0,0 +1,34 @@
+import pickle
+import struct
+
+
+class Connection(object):
+	"""Sends and receives pickled objects over a stream socket, each prefixed with its length"""
+	_header = struct.Struct("!I")
+
+	def __init__(self, sock):
+		self._socket = sock
+
+	def send(self, obj):
+		data = pickle.dumps(obj, protocol=pickle.HIGHEST_PROTOCOL)
+		self._socket.sendall(self._header.pack(len(data)) + data)
+
+	def receive(self):
+		size, = self._header.unpack(self._read(self._header.size))
+		return pickle.loads(self._read(size))
+
+	def _read(self, size):
+		chunks = []
+		while size > 0:
+			chunk = self._socket.recv(min(size, 1 << 20))
+			if not chunk:
+				raise EOFError
+			chunks.append(chunk)
+			size -= len(chunk)
+		return b"".join(chunks)
+
+	def fileno(self):
+		return self._socket.fileno()
+
+	def close(self):
+		self._socket.close()
@@ -0,0 +1,78 @@
+from arago.actors import Actor, Router, RESTART
+from arago.actors.routers.process_pool.connection import Connection
+import gevent, gevent.socket, gevent.subprocess
+import logging
+import os
+import sys
+
+
+class WorkerCrashedError(Exception):
+	__str__ = lambda x: "WorkerCrashedError"
+
+
+class WorkerProcess(Actor):
+	("""Stands in for an instance of worker_cls(*worker_args, **worker_kwargs) running """
+	 """in a process of its own. Messages and payloads are pickled, so are results and """
+	 """exceptions. worker_cls has to be importable, i.e. not defined in __main__. """
+	 """The sender does not cross process boundaries. If the hosted actor crashes or the """
+	 """process dies, this actor crashes, so its supervisor's policy applies. The process """
+	 """is (re-)started with the first message after (re-)starting this actor.""")
+	def __init__(self, worker_cls, worker_args=(), worker_kwargs=None, name=None, *args, **kwargs):
+		self._worker = (worker_cls, tuple(worker_args), dict(worker_kwargs or {}))
+		self._process = None
+		self._connection = None
+		super().__init__(name=name, *args, **kwargs)
+
+	def _spawn(self):
+		parent_socket, child_socket = gevent.socket.socketpair()
+		level = logging.getLevelName(self._logger.getEffectiveLevel())
+		self._process = gevent.subprocess.Popen(
+			[sys.executable, "-m", "arago.actors.routers.process_pool.worker", str(child_socket.fileno()), str(level)],
+			pass_fds=(child_socket.fileno(),),
+			env=dict(os.environ, PYTHONPATH=os.pathsep.join(path for path in sys.path if path)))
+		child_socket.close()
+		self._connection = Connection(parent_socket)
+		self._connection.send(self._worker)
+		self._logger.debug("{me} started worker process {pid}".format(me=self, pid=self._process.pid))
+
+	def handle(self, msg, payload, sender):
+		if self._process is None or self._process.poll() is not None:
+			self._spawn()
+		try:
+			self._connection.send((msg, payload))
+			success, result = self._connection.receive()
+		except (EOFError, OSError):
+			self._logger.error("{me} lost worker process {pid}".format(me=self, pid=self._process.pid))
+			raise WorkerCrashedError
+		if not success:
+			raise result
+		return result
+
+	def on_stop(self):
+		if self._connection:
+			self._connection.close()
+			self._connection = None
+		if self._process:
+			try:
+				self._process.wait(timeout=5)
+			except gevent.subprocess.TimeoutExpired:
+				self._process.kill()
+				self._process.wait()
+			self._logger.debug("{me} has shut down worker process {pid}".format(me=self, pid=self._process.pid))
+			self._process = None
+
+
+class ProcessPoolRouter(Router):
+	("""Runs processes instances (default: one per CPU) of worker_cls, each in a process """
+	 """of its own, and routes received messages to the running one with the fewest waiting """
+	 """messages. Crashing workers are handled according to policy.""")
+	def __init__(self, worker_cls, processes=None, worker_args=(), worker_kwargs=None, name=None, policy=RESTART, *args, **kwargs):
+		super().__init__(name=name, policy=policy, *args, **kwargs)
+		for i in range(processes or os.cpu_count() or 1):
+			self.register_child(WorkerProcess(
+				worker_cls, worker_args, worker_kwargs,
+				name="{me}-worker-{i}".format(me=self.name, i=i)))
+
+	def _route(self, task):
+		running = [child for child in self._children if not child._stopped] or self._children
+		return min(running, key=lambda child: len(child._mailbox))
@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+"""Hosts an actor for a WorkerProcess, run as: python -m arago.actors.routers.process_pool.worker <fd> <loglevel>"""
+from gevent import monkey; monkey.patch_all()
+from arago.actors.routers.process_pool.connection import Connection
+from arago.common.logging import getCustomLogger
+import pickle
+import socket
+import sys
+
+
+class RemoteError(Exception):
+	"""Stands in for an exception that could not be pickled"""
+
+
+def main(fd, level):
+	logger = getCustomLogger(level=level)
+	connection = Connection(socket.socket(fileno=fd))
+	worker_cls, args, kwargs = connection.receive()
+	actor = worker_cls(*args, **kwargs)
+	logger.debug("{me} is hosting {actor}".format(me=sys.argv[0], actor=actor))
+	while True:
+		try:
+			msg, payload = connection.receive()
+		except EOFError:
+			break
+		try:
+			reply = (True, actor.wait_for(msg, payload))
+		except Exception as err:
+			reply = (False, err)
+		try:
+			pickle.dumps(reply[1], protocol=pickle.HIGHEST_PROTOCOL)
+		except Exception as err:
+			reply = (False, RemoteError("{err!r} (unpicklable result: {e})".format(err=reply[1], e=err)))
+		connection.send(reply)
+		if not reply[0]:
+			# The hosted actor crashed, so does its process
+			sys.exit(1)
+	actor.stop()
+
+
+if __name__ == "__main__":
+	main(int(sys.argv[1]), sys.argv[2])
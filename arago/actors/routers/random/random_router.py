@@ -4,4 +4,4 @@ import random
 class RandomRouter(Router):
 	"""Routes received messages to a random child"""
 	def _route(self, msg):
-		return random.choice(self._children.greenlets)
+		return random.choice(self._children)
@@ -1,13 +1,78 @@
 from arago.actors import Router
+from collections import defaultdict
+
+
+class LoadIndex(object):
+	("""Keeps actors in buckets by load, so that the least loaded one is found in O(1). """
+	 """Within a bucket, the actor that has been in it the longest comes first.""")
+	def __init__(self):
+		self._buckets = defaultdict(dict)
+		self._loads = {}
+		self._min = 0
+
+	def __len__(self):
+		return len(self._loads)
+
+	def update(self, actor, load):
+		old = self._loads.get(actor)
+		if old == load:
+			return
+		if old is not None:
+			self._discard(actor, old)
+		self._buckets[load][actor] = None
+		self._loads[actor] = load
+		if load < self._min:
+			self._min = load
+		else:
+			self._seek()
+
+	def remove(self, actor):
+		old = self._loads.pop(actor, None)
+		if old is not None:
+			self._discard(actor, old)
+			self._seek()
+
+	def _discard(self, actor, load):
+		bucket = self._buckets[load]
+		del bucket[actor]
+		if not bucket:
+			del self._buckets[load]
+
+	def _seek(self):
+		"""Move the minimum up to the next non-empty bucket, loads mostly change by one"""
+		if not self._buckets:
+			self._min = 0
+		while self._buckets and self._min not in self._buckets:
+			self._min += 1
+
+	def least(self):
+		return next(iter(self._buckets[self._min])) if self._loads else None
+
 
 class ShortestQueueRouter(Router):
-	"""Routes received messages to the child with the lowest number of enqueued tasks"""
+	("""Routes received messages to the child with the lowest load, i.e. the number """
+	 """of messages waiting in its mailbox plus the one it is handling. Children report """
+	 """changes of their load, so finding the least loaded one takes O(1).""")
+	def __init__(self, *args, **kwargs):
+		self._index = LoadIndex()
+		super().__init__(*args, **kwargs)
+
 	def _route(self, msg):
-		# Try to simply find a free worker, first
-		for item in self._children:
-			if hasattr(item, "_busy") and not item._busy:
-				return item
-		# If all workers are busy, order them by queue length and return the first
-		# FIXME: Can probably be optimized by not sorting the whole list
-		item = sorted(self._children, key=lambda item: len(item._mailbox), reverse=False)[0]
-		return item
+		child = self._index.least()
+		if child is None:
+			raise IndexError("{me} has no children to route to".format(me=self))
+		return child
+
+	def _child_load_changed(self, child):
+		self._index.update(child, child.load)
+
+	def register_child(self, child):
+		super().register_child(child)
+		child = self._children[-1]
+		child._report_load = True
+		self._index.update(child, child.load)
+
+	def unregister_child(self, child):
+		super().unregister_child(child)
+		child._report_load = False
+		self._index.remove(child)
@@ -0,0 +1,88 @@
+import gevent
+import logging
+import time
+
+from arago.actors.actor import ActorStoppedError
+from arago.actors.mailbox import MailboxFullError
+from arago.actors.timer_wheel import TimerWheel
+
+
+class ScheduledMessage(object):
+	("""A message to be sent by a Scheduler, once or every interval seconds. If the actor's """
+	 """mailbox is full, the message is skipped (and counted in skipped) instead of waiting """
+	 """for room, a periodic message is sent again next time.""")
+	__slots__ = ("actor", "msg", "payload", "sender", "interval", "when", "skipped")
+
+	def __init__(self, actor, msg, payload, sender, interval, when):
+		self.actor = actor
+		self.msg = msg
+		self.payload = payload
+		self.sender = sender
+		self.interval = interval
+		self.when = when
+		self.skipped = 0
+
+	def __call__(self, now):
+		try:
+			mailbox = getattr(self.actor, "_mailbox", None)
+			if mailbox is not None and mailbox.full():
+				raise MailboxFullError
+			self.actor.tell(self.msg, payload=self.payload, sender=self.sender)
+		except ActorStoppedError:
+			logging.getLogger('root').debug("Dropped {me}, the actor is stopped".format(me=self))
+			return None
+		except MailboxFullError:
+			self.skipped += 1
+			logging.getLogger('root').debug("Skipped {me}, the mailbox of the actor is full".format(me=self))
+		if self.interval:
+			self.when = max(self.when + self.interval, now)
+			return self.when
+
+	def __str__(self):
+		return "<ScheduledMessage, actor={actor}, message={msg}, interval={i}>".format(actor=self.actor, msg=self.msg, i=self.interval)
+
+
+class Scheduler(object):
+	("""Sends messages to actors after a delay or periodically. All schedules share one """
+	 """hierarchical TimerWheel instead of having a timer or greenlet each, and all messages """
+	 """that are due are told in one batch per tick of the wheel by the wheel's dispatcher """
+	 """greenlet, so they are up to one resolution late. The returned handles cancel a """
+	 """schedule with cancel(). """
+	 """Periodic messages to an actor that has stopped are canceled.""")
+	def __init__(self, wheel=None):
+		self._wheel = wheel or TimerWheel.instance()
+
+	@classmethod
+	def instance(cls):
+		"""The scheduler shared by everything running on the current hub"""
+		hub = gevent.get_hub()
+		scheduler = getattr(hub, "_scheduler", None)
+		if scheduler is None:
+			scheduler = hub._scheduler = cls()
+		return scheduler
+
+	def __len__(self):
+		return len(self._wheel)
+
+	def schedule_once(self, actor, msg, delay, payload=None, sender=None):
+		"""Tell actor msg in delay seconds"""
+		when = time.monotonic() + delay
+		return self._wheel.add(when, ScheduledMessage(actor, msg, payload, sender, None, when))
+
+	def schedule_every(self, actor, msg, interval, payload=None, sender=None, delay=None):
+		"""Tell actor msg every interval seconds, the first time in delay (default: interval) seconds"""
+		when = time.monotonic() + (interval if delay is None else delay)
+		return self._wheel.add(when, ScheduledMessage(actor, msg, payload, sender, interval, when))
+
+	def __str__(self):
+		return "<Scheduler, {n} scheduled>".format(n=len(self))
+
+
+def schedule_once(actor, msg, delay, payload=None, sender=None):
+	"""Tell actor msg in delay seconds, using the scheduler of the current hub"""
+	return Scheduler.instance().schedule_once(actor, msg, delay, payload=payload, sender=sender)
+
+
+def schedule_every(actor, msg, interval, payload=None, sender=None, delay=None):
+	"""Tell actor msg every interval seconds, using the scheduler of the current hub"""
+	return Scheduler.instance().schedule_every(actor, msg, interval, payload=payload, sender=sender, delay=delay)
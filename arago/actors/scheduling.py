@@ -0,0 +1,53 @@
+"""When actors and senders yield to the hub.
+
+Every message an actor handles and every message sent is charged to the budget of
+the current greenlet: the budget of the actor it belongs to, or default_budget.
+Assign a YieldBudget to arago.actors.scheduling.default_budget to change it globally."""
+import gevent, gevent.hub
+import time
+
+
+class YieldBudget(object):
+	("""Lets a greenlet handle or send up to messages messages, or work for up to usec """
+	 """microseconds, before it yields to the hub, whichever comes first (None: no limit). """
+	 """With idle=True, it waits until the hub has nothing else left to do, which is """
+	 """fairest to other actors but costs a full loop iteration; otherwise it only lets """
+	 """the greenlets run that are ready at that moment.""")
+	def __init__(self, messages=64, usec=200, idle=True):
+		self.messages = messages
+		self.usec = usec
+		self.idle = idle
+
+	def spend(self, current):
+		used = getattr(current, "_budget_used", 0)
+		if used == 0 and self.usec:
+			current._budget_since = time.perf_counter()
+		used += 1
+		if ((self.messages and used >= self.messages)
+		    or (self.usec and (time.perf_counter() - current._budget_since) * 1e6 >= self.usec)):
+			current._budget_used = 0
+			if self.idle:
+				gevent.idle()
+			else:
+				gevent.sleep(0)
+		else:
+			current._budget_used = used
+
+	def __str__(self):
+		return "<YieldBudget, messages={n}, usec={usec}, idle={idle}>".format(n=self.messages, usec=self.usec, idle=self.idle)
+
+EAGER = YieldBudget(messages=1, usec=None, idle=True) # yield before every message, as actors used to
+default_budget = YieldBudget()
+
+
+def cooperate():
+	"""Charge a message to the current greenlet and yield to the hub if its budget is spent"""
+	current = gevent.getcurrent()
+	if isinstance(current, gevent.hub.Hub):
+		return
+	(getattr(current, "_budget", None) or default_budget).spend(current)
+
+
+def rest():
+	"""Start a new budget for the current greenlet, which is about to block anyway"""
+	gevent.getcurrent()._budget_used = 0
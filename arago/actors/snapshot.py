@@ -0,0 +1,120 @@
+import gevent
+import mmap
+import os
+import pickle
+import time
+import weakref
+from functools import partial
+from arago.actors.actor import Message
+from arago.actors.symbols import SNAPSHOT
+from arago.actors.timer_wheel import TimerWheel
+
+
+class Snapshotting(object):
+	("""Mixin for actors with a context that is expensive to rebuild, use as """
+	 """class MyActor(Snapshotting, Actor). The context is pickled to the file snapshot """
+	 """whenever the actor receives SNAPSHOT, snapshot() is called or, with snapshot_interval, """
+	 """every snapshot_interval seconds if messages were handled since the last snapshot. """
+	 """Snapshots are taken between messages and replace the previous one atomically, so the """
+	 """file always holds the latest good snapshot. When the actor is created without a """
+	 """context, and when it is started again after clear() (e.g. by a Monitor with the RESTART """
+	 """policy), the context is loaded from the snapshot, if there is one, instead of starting """
+	 """out empty. The context has to be picklable.""")
+	def __init__(self, *args, snapshot, snapshot_interval=None, **kwargs):
+		self._snapshot_path = snapshot
+		self._snapshot_interval = snapshot_interval
+		self._dirty = False
+		self._cleared = False
+		self._snapshot_message = Message(SNAPSHOT)
+		self._snapshot_queued = False
+		self._snapshot_deadline = None
+		super().__init__(*args, **kwargs)
+		if kwargs.get("context") is None:
+			self._restore()
+		self._schedule_snapshots()
+
+	def _schedule_snapshots(self):
+		if self._snapshot_interval and (self._snapshot_deadline is None or self._snapshot_deadline.canceled):
+			self._snapshot_deadline = TimerWheel.instance().add(
+				time.monotonic() + self._snapshot_interval, partial(Snapshotting._snapshot_due, weakref.proxy(self)))
+
+	def _snapshot_due(self, now):
+		"""Queue a snapshot as a control message, which is neither blocked by a full mailbox nor journaled"""
+		if self._stopped:
+			self._snapshot_deadline = None
+			return None
+		if self._dirty and not self._snapshot_queued:
+			self._snapshot_queued = True
+			self._mailbox.put_system(self._snapshot_message)
+		return now + self._snapshot_interval
+
+	def snapshot(self):
+		"""Write the context to the snapshot file, return True if it was written"""
+		try:
+			data = pickle.dumps(self.context, protocol=pickle.HIGHEST_PROTOCOL)
+			self._dirty = False
+			gevent.get_hub().threadpool.apply(self._write_snapshot, (data,))
+		except Exception as err:
+			self._dirty = True
+			self._logger.error("{me} failed to write a snapshot of its context to {path}: {err}".format(me=self, path=self._snapshot_path, err=err))
+			return False
+		self._logger.debug("{me} wrote a snapshot of its context to {path} ({n} bytes)".format(me=self, path=self._snapshot_path, n=len(data)))
+		return True
+
+	def _write_snapshot(self, data):
+		temporary = self._snapshot_path + ".tmp"
+		with open(temporary, "wb") as snapshot:
+			snapshot.write(data)
+			snapshot.flush()
+			os.fsync(snapshot.fileno())
+		os.replace(temporary, self._snapshot_path)
+
+	def _restore(self):
+		"""Load the context from the snapshot file, if there is one, memory-mapped to avoid a copy"""
+		try:
+			with open(self._snapshot_path, "rb") as snapshot:
+				with mmap.mmap(snapshot.fileno(), 0, access=mmap.ACCESS_READ) as view:
+					self.context = pickle.loads(view)
+		except FileNotFoundError:
+			return False
+		except Exception as err:
+			self._logger.warn("{me} failed to load a snapshot of its context from {path}, starting out empty: {err}".format(me=self, path=self._snapshot_path, err=err))
+			return False
+		self._logger.debug("{me} loaded a snapshot of its context from {path}".format(me=self, path=self._snapshot_path))
+		return True
+
+	def _handle(self, task):
+		if task.msg is SNAPSHOT:
+			if task is self._snapshot_message:
+				self._snapshot_queued = False
+			task.set(self.snapshot())
+			return task
+		self._dirty = True
+		return super()._handle(task)
+
+	def _handle_batch(self, tasks):
+		self._dirty = True
+		rest = []
+		for task in tasks:
+			if task.msg is SNAPSHOT:
+				self._handle(task)
+			else:
+				rest.append(task)
+		return super()._handle_batch(rest) if rest else tasks
+
+	def clear(self):
+		super().clear()
+		self._cleared = True
+		self._snapshot_queued = False
+
+	def start(self):
+		if self._cleared and self._stopped:
+			self._cleared = False
+			self._restore()
+		super().start()
+		self._schedule_snapshots()
+
+	def __del__(self):
+		if getattr(self, "_snapshot_deadline", None):
+			self._snapshot_deadline.cancel()
+		super().__del__()
@@ -11,7 +11,7 @@ class Source(Actor):
 		self._server = server
 		self._server.start()
 
-	def _receive(self, msg, sender=None):
+	def _receive(self, *args, **kwargs):
 		raise SourceDoesntAcceptMessagesError
 
 	def start(self):
@@ -0,0 +1 @@
+from .remote_source import RemoteSource
@@ -0,0 +1,99 @@
+from arago.actors import Source
+from arago.actors.remote import Channel, RemoteError, UnknownActorError, parse_address, TELL, ASK, REPLY, ERROR
+import gevent, gevent.server, gevent.socket
+import os
+import time
+import socket
+import weakref
+from functools import partial
+
+
+class RemoteSource(Source):
+	("""Listens on address (tcp://host:port or unix:///path) for frames sent by ActorRefs """
+	 """and dispatches them to the local actors registered by name. Replies to asks are """
+	 """sent back as soon as they are ready, in whatever order that happens.""")
+	def __init__(self, address, actors=None, *args, **kwargs):
+		self._address = address
+		self._actors = {}
+		self._channels = set()
+		[self.register(actor) for actor in actors] if actors else None
+		server = gevent.server.StreamServer(self._listen(), self._serve)
+		super().__init__(server, *args, **kwargs)
+		self._me = weakref.proxy(self)
+
+	def _listen(self):
+		"""Return what the server listens on, a unix socket is bound afresh (replacing a stale socket file)"""
+		family, bind_address = parse_address(self._address)
+		if family != socket.AF_UNIX:
+			return bind_address
+		self._unlink()
+		listener = gevent.socket.socket(family, socket.SOCK_STREAM)
+		listener.bind(bind_address)
+		listener.listen(128)
+		return listener
+
+	def _unlink(self):
+		family, bind_address = parse_address(self._address)
+		if family == socket.AF_UNIX and os.path.exists(bind_address):
+			os.unlink(bind_address)
+
+	def register(self, actor, name=None):
+		"""Make actor reachable as name (default: actor.name)"""
+		self._actors[name or actor.name] = actor
+
+	def unregister(self, name):
+		self._actors.pop(name, None)
+
+	def _serve(self, sock, address):
+		self._logger.debug("{me} accepted connection from {addr}".format(me=self, addr=address or "local peer"))
+		channel = Channel(sock, None)
+		channel._on_frame = partial(self._dispatch, channel)
+		self._channels.add(channel)
+		try:
+			channel.run()
+		finally:
+			self._channels.discard(channel)
+		self._logger.debug("{me} closed connection from {addr}".format(me=self, addr=address or "local peer"))
+
+	def _dispatch(self, channel, kind, request_id, body):
+		target, msg, payload, priority, timeout = body
+		deadline = None if timeout is None else time.monotonic() + timeout
+		try:
+			actor = self._actors[target]
+			if kind == TELL:
+				actor.tell(msg, payload, sender=self._me, priority=priority, deadline=deadline)
+			elif kind == ASK:
+				task = actor.ask(msg, payload, sender=self._me, priority=priority, deadline=deadline)
+				task.rawlink(partial(self._reply, channel, request_id))
+		except Exception as err:
+			if kind == ASK:
+				self._send(channel, ERROR, request_id, UnknownActorError() if isinstance(err, KeyError) else err)
+			else:
+				self._logger.warning("{me} could not deliver {msg} to {target}: {err!r}".format(me=self, msg=msg, target=target, err=err))
+
+	def _reply(self, channel, request_id, task):
+		if task.successful():
+			self._send(channel, REPLY, request_id, task.value)
+		else:
+			self._send(channel, ERROR, request_id, task.exception)
+
+	def _send(self, channel, kind, request_id, body):
+		if channel.closed:
+			return
+		try:
+			channel.send(kind, request_id, body)
+		except Exception as err:
+			channel.send(ERROR, request_id, RemoteError("{body!r} (unpicklable: {err})".format(body=body, err=err)))
+
+	def start(self):
+		if self._stopped:
+			self._server = gevent.server.StreamServer(self._listen(), self._serve)
+		super().start()
+
+	def stop(self):
+		# Clean up first: stopping may have our monitor start us again right away
+		if not self._stopped:
+			for channel in list(self._channels):
+				channel.close()
+			self._unlink()
+		super().stop()
@@ -1,8 +1,14 @@
 from arago.actors import Actor, Source
+from arago.actors.actor import TaskCanceledError
+from collections import OrderedDict
+import codecs
 import falcon
 import fastjsonschema
-import gevent, gevent.pywsgi
+import gevent, gevent.lock, gevent.pywsgi, gevent.queue
+import json
 import logging
+import re
+import time
 import weakref
 
 from urllib.parse import urlparse, urlunparse
@@ -26,6 +32,122 @@ def schema_validation(req, resp, resource, *args, **kwargs):
 	except KeyError:
 		logger.debug("No schema for {rtype} given, skipping validation.".format(rtype=rtype))
 
+_whitespace = re.compile(r"[ \t\r\n]*")
+_blanks = re.compile(r"[ \t\r]*")
+_decoder = json.JSONDecoder()
+_number_chars = "0123456789+-.eE" # a number followed by nothing but these may go on in the next chunk
+_longest_token = len("-Infinit") # an error further than that from the end of the buffer can't be cured by more input
+
+def iter_json(stream, chunk_size=65536, max_value_size=16 << 20):
+	"""Yield the values of an NDJSON or JSON array body one by one, reading at most a line or chunk_size bytes at a time.
+	A body starting with [ is a JSON array, anything else is NDJSON. Raise ValueError if the body is neither, as soon
+	as a value can't be completed any more, or if a value grows beyond max_value_size characters."""
+	text = codecs.getincrementaldecoder("utf-8")()
+	buffer = ""
+	offset = 0
+	array = None # unknown until the first value
+	expect = "value" # or "first" (value or ]), "separator" (, or ]), "newline", "end"
+	eof = False
+	while not eof:
+		chunk = stream.readline(chunk_size)
+		eof = not chunk
+		buffer += text.decode(chunk, final=eof)
+		position = 0
+		while True:
+			if expect == "newline":
+				position = _blanks.match(buffer, position).end()
+				if position == len(buffer):
+					break
+				if buffer[position] != "\n":
+					raise ValueError("Expecting a newline between values: char {n}".format(n=offset + position))
+				expect = "value"
+			position = _whitespace.match(buffer, position).end()
+			if position == len(buffer):
+				break
+			char = buffer[position]
+			if expect == "end":
+				raise ValueError("Extra data after the array: char {n}".format(n=offset + position))
+			elif expect == "separator":
+				if char not in ",]":
+					raise ValueError("Expecting ',' or ']' between values: char {n}".format(n=offset + position))
+				expect = "value" if char == "," else "end"
+				position += 1
+			elif array is None and char == "[":
+				array = True
+				expect = "first"
+				position += 1
+			elif expect == "first" and char == "]":
+				expect = "end"
+				position += 1
+			else:
+				try:
+					item, end = _decoder.raw_decode(buffer, position)
+				except json.JSONDecodeError as e:
+					if eof or (len(buffer) - e.pos > _longest_token and not e.msg.startswith("Unterminated string")):
+						raise ValueError("{err}: char {n}".format(err=e.msg, n=offset + e.pos))
+					if len(buffer) - position > max_value_size:
+						raise ValueError("Value larger than {max} characters: char {n}".format(max=max_value_size, n=offset + position))
+					break
+				if not eof and (end == len(buffer) or isinstance(item, (int, float)) and not buffer[end:].strip(_number_chars)):
+					break
+				array = bool(array)
+				expect = "separator" if array else "newline"
+				yield item
+				position = end
+		offset += position
+		buffer = buffer[position:]
+	if array and expect != "end":
+		raise ValueError("Unterminated array: char {n}".format(n=offset))
+
+class JobStore(object):
+	("""Keeps the tasks of asynchronous jobs by id, at most max_jobs of them. Finished jobs """
+	 """are forgotten ttl seconds after they finished. If the store is full, the job that """
+	 """finished first makes room, or else the oldest job, which is canceled.""")
+	def __init__(self, max_jobs=10000, ttl=300):
+		self._jobs = OrderedDict()
+		self._finished = OrderedDict()
+		self._max_jobs = max_jobs
+		self._ttl = ttl
+
+	def __len__(self):
+		return len(self._jobs)
+
+	def add(self, task):
+		"""Store task, return its job id"""
+		self._expire()
+		while len(self._jobs) >= self._max_jobs:
+			self._evict()
+		job_id = uuid4().hex
+		self._jobs[job_id] = task
+		task.rawlink(lambda task: self._finish(job_id))
+		return job_id
+
+	def get(self, job_id):
+		"""Return the task of job_id, None if there is none (any more)"""
+		self._expire()
+		return self._jobs.get(job_id)
+
+	def _finish(self, job_id):
+		if job_id in self._jobs:
+			self._finished[job_id] = time.monotonic() + self._ttl
+
+	def _expire(self):
+		now = time.monotonic()
+		while self._finished:
+			job_id, expires = next(iter(self._finished.items()))
+			if expires > now:
+				break
+			del self._finished[job_id]
+			del self._jobs[job_id]
+
+	def _evict(self):
+		if self._finished:
+			job_id, expires = self._finished.popitem(last=False)
+			del self._jobs[job_id]
+		else:
+			job_id, task = self._jobs.popitem(last=False)
+			task.cancel()
+
 class RestServer(Source):
 	def __init__(self, endpoint, app, *args, **kwargs):
 		self._logger = logging.getLogger('root')
@@ -38,11 +160,19 @@ class RestServer(Source):
 		super().__init__(server, *args, **kwargs)
 
 class HIROEngineSyncRESTInterface(RestServer):
-	def __init__(self, handler, endpoint, req_schema=None, resp_schema=None, *args, **kwargs):
+	def __init__(self, handler, endpoint, req_schema=None, resp_schema=None, max_pending=100,
+	             max_jobs=10000, jobs_ttl=300, *args, **kwargs):
 		self._app = falcon.API()
+		self._jobs = JobStore(max_jobs=max_jobs, ttl=jobs_ttl)
 		self._routes = {
 			'/request': HIROEngineSyncRESTInterface.Endpoint(handler, req_schema, resp_schema,
-			                                                 actor=weakref.proxy(self))
+			                                                 actor=weakref.proxy(self)),
+			'/bulk': HIROEngineSyncRESTInterface.BulkEndpoint(handler, req_schema, resp_schema,
+			                                                  actor=weakref.proxy(self), max_pending=max_pending),
+			'/jobs': HIROEngineSyncRESTInterface.JobsEndpoint(handler, req_schema, resp_schema,
+			                                                  actor=weakref.proxy(self), jobs=self._jobs),
+			'/jobs/{job_id}': HIROEngineSyncRESTInterface.JobEndpoint(handler, req_schema, resp_schema,
+			                                                          actor=weakref.proxy(self), jobs=self._jobs)
 		}
 		[self._app.add_route(route, handler) for route, handler in self._routes.items()]
 		super().__init__(endpoint, self._app, *args, **kwargs)
@@ -71,3 +201,152 @@ class HIROEngineSyncRESTInterface(RestServer):
 				resp.status = falcon.HTTP_200
 			except Exception as e:
 				raise falcon.HTTPInternalServerError(description=str(e))
+
+	class BulkEndpoint(Endpoint):
+		("""Takes a stream of requests as NDJSON or JSON array, asks the handler for each of them """
+		 """concurrently and streams the results back as NDJSON, in the order they finish. """
+		 """Each result line carries the index of its request. At most max_pending requests are """
+		 """read ahead of the results that have been sent.""")
+		def __init__(self, handler, req_schema=None, resp_schema=None, actor=None, max_pending=100):
+			super().__init__(handler, req_schema, resp_schema, actor)
+			self._max_pending = max_pending
+
+		def on_post(self, req, resp):
+			resp.content_type = "application/x-ndjson"
+			resp.status = falcon.HTTP_200
+			resp.stream = self._stream(req.stream)
+
+		def _stream(self, body):
+			results = gevent.queue.Queue()
+			slots = gevent.lock.BoundedSemaphore(self._max_pending)
+			tasks = {}
+			reader = gevent.spawn(self._read, body, results, slots, tasks)
+			sent, total = 0, None
+			try:
+				while total is None or sent < total:
+					index, line = results.get()
+					if index is None:
+						total = line
+						continue
+					sent += 1
+					tasks.pop(index, None)
+					slots.release()
+					yield line
+			finally:
+				reader.kill(block=False)
+				for task in tasks.values():
+					task.cancel()
+
+		def _read(self, body, results, slots, tasks):
+			count = 0
+			try:
+				for item in iter_json(body):
+					slots.acquire()
+					index, count = count, count + 1
+					try:
+						validate = self._validators.get("req_schema")
+						if validate:
+							validate(item)
+						task = self._handler.ask("action_request", item, sender=self._actor)
+					except fastjsonschema.JsonSchemaException:
+						self._logger.warn("Request {i} could not be validated against schema.".format(i=index))
+						results.put((index, self._line({"index": index, "status": "failed", "error": "Request could not be validated against schema."})))
+						continue
+					except Exception as e:
+						results.put((index, self._line({"index": index, "status": "failed", "error": str(e)})))
+						continue
+					tasks[index] = task
+					task.rawlink(lambda task, index=index: results.put((index, self._result(index, task))))
+			except ValueError as e:
+				self._logger.warn("Bulk request body could not be parsed: {err}".format(err=e))
+				slots.acquire()
+				results.put((count, self._line({"index": count, "status": "failed", "error": "Request body could not be parsed: {err}".format(err=e)})))
+				count += 1
+			finally:
+				results.put((None, count))
+
+		def _result(self, index, task):
+			if not task.successful():
+				return self._line({"index": index, "status": "failed", "error": str(task.exception)})
+			media = {"status": "done", "result": task.value}
+			try:
+				validate = self._validators.get("resp_schema")
+				if validate:
+					validate(media)
+				return self._line(dict(index=index, **media))
+			except fastjsonschema.JsonSchemaException:
+				self._logger.warn("Response {i} could not be validated against schema.".format(i=index))
+				return self._line({"index": index, "status": "failed", "error": "Response could not be validated against schema."})
+			except (TypeError, ValueError) as e:
+				return self._line({"index": index, "status": "failed", "error": str(e)})
+
+		@staticmethod
+		def _line(line):
+			return (json.dumps(line) + "\n").encode("utf-8")
+
+	class JobsEndpoint(Endpoint):
+		"""Starts a job for a request and answers 202 Accepted with its id right away"""
+		def __init__(self, handler, req_schema=None, resp_schema=None, actor=None, jobs=None):
+			super().__init__(handler, req_schema, resp_schema, actor)
+			self._jobs = jobs
+
+		@falcon.before(schema_validation, schema="req_schema")
+		def on_post(self, req, resp):
+			try:
+				task = self._handler.ask("action_request", req.media, sender=self._actor)
+			except Exception as e:
+				raise falcon.HTTPInternalServerError(description=str(e))
+			job_id = self._jobs.add(task)
+			resp.media = {
+				"id": job_id,
+				"status": "pending"
+			}
+			resp.location = "/jobs/{id}".format(id=job_id)
+			resp.status = falcon.HTTP_202
+
+	class JobEndpoint(Endpoint):
+		("""Reports the state of a job: pending, done (with result), failed (with error) or """
+		 """canceled. With ?wait=seconds, waits up to max_wait seconds for a pending job to """
+		 """finish (long polling). DELETE cancels the job, a handler that hasn't started on it """
+		 """yet skips it.""")
+		def __init__(self, handler, req_schema=None, resp_schema=None, actor=None, jobs=None, max_wait=60):
+			super().__init__(handler, req_schema, resp_schema, actor)
+			self._jobs = jobs
+			self._max_wait = max_wait
+
+		def _task(self, job_id):
+			task = self._jobs.get(job_id)
+			if task is None:
+				raise falcon.HTTPNotFound(description="No job {id} (any more).".format(id=job_id))
+			return task
+
+		def on_get(self, req, resp, job_id):
+			task = self._task(job_id)
+			wait = req.get_param_as_float("wait")
+			if wait and not task.ready():
+				task.wait(timeout=min(wait, self._max_wait))
+			resp.media = self._state(job_id, task)
+			resp.status = falcon.HTTP_200
+
+		def on_delete(self, req, resp, job_id):
+			task = self._task(job_id)
+			task.cancel()
+			resp.media = self._state(job_id, task)
+			resp.status = falcon.HTTP_200
+
+		def _state(self, job_id, task):
+			if not task.ready():
+				return {"id": job_id, "status": "pending"}
+			elif isinstance(task.exception, TaskCanceledError):
+				return {"id": job_id, "status": "canceled"}
+			elif not task.successful():
+				return {"id": job_id, "status": "failed", "error": str(task.exception)}
+			media = {"status": "done", "result": task.value}
+			try:
+				validate = self._validators.get("resp_schema")
+				if validate:
+					validate(media)
+			except fastjsonschema.JsonSchemaException:
+				self._logger.warn("Response of job {id} could not be validated against schema.".format(id=job_id))
+				return {"id": job_id, "status": "failed", "error": "Response could not be validated against schema."}
+			return dict(id=job_id, **media)
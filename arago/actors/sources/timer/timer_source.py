@@ -1,4 +1,6 @@
 from arago.actors.source import Source
+from arago.actors.mailbox import MailboxFullError
+from arago.actors.timer_wheel import Dispatcher
 import time
 import gevent
 
@@ -32,6 +34,16 @@ class TimerSource(Source):
 		now = time.time()
 		self._logger.debug("{me} triggered at {ts}".format(me=self, ts=now))
 		if self._handler:
-			gevent.spawn(self._handler.tell, self._msg, {"timestamp": now}, self)
+			Dispatcher.instance().call(self._notify, now)
 		else:
 			self._logger.warning("{me} has no handler defined!")
+
+	def _notify(self, now):
+		"""Tell the handler, skip this wakeup if its mailbox is full"""
+		try:
+			mailbox = getattr(self._handler, "_mailbox", None)
+			if mailbox is not None and mailbox.full():
+				raise MailboxFullError
+			self._handler.tell(self._msg, {"timestamp": now}, self)
+		except Exception as err:
+			self._logger.warning("{me} failed to notify {h}: {err}".format(me=self, h=self._handler, err=err))
@@ -2,3 +2,7 @@ from arago.common.symbol_type import Symbol
 
 OK   = Symbol('OK',   __name__)
 FAIL = Symbol('FAIL', __name__)
+
+INVALIDATE     = Symbol('INVALIDATE',     __name__) # forget the cached result for the key given as payload
+INVALIDATE_ALL = Symbol('INVALIDATE_ALL', __name__) # forget all cached results
+SNAPSHOT       = Symbol('SNAPSHOT',       __name__) # write a snapshot of the context now
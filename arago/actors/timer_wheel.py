@@ -0,0 +1,176 @@
+import gevent, gevent.queue
+import logging
+import time
+
+
+class Deadline(object):
+	"""An entry in a TimerWheel, call cancel() to remove it"""
+	__slots__ = ("when", "callback", "canceled", "_wheel", "_slot")
+
+	def __init__(self, when, callback, wheel):
+		self.when = when
+		self.callback = callback
+		self.canceled = False
+		self._wheel = wheel
+		self._slot = None
+
+	def cancel(self):
+		if not self.canceled:
+			self.canceled = True
+			if self._slot is not None:
+				del self._slot[self]
+				self._slot = None
+			self._wheel._forget()
+
+
+class Dispatcher(object):
+	("""Calls functions handed over by event loop callbacks, which must not block, in one """
+	 """long-lived greenlet, where they may, in the order they were handed over.""")
+	def __init__(self):
+		self._logger = logging.getLogger('root')
+		self._calls = gevent.queue.Queue()
+		self._greenlet = None
+
+	@classmethod
+	def instance(cls):
+		"""The dispatcher shared by everything running on the current hub"""
+		hub = gevent.get_hub()
+		dispatcher = getattr(hub, "_dispatcher", None)
+		if dispatcher is None:
+			dispatcher = hub._dispatcher = cls()
+		return dispatcher
+
+	def call(self, func, *args):
+		"""Have func(*args) called by the dispatcher greenlet, never blocks"""
+		self._calls.put((func, args))
+		if self._greenlet is None or self._greenlet.dead:
+			self._greenlet = gevent.spawn(self._run)
+
+	def _run(self):
+		for func, args in self._calls:
+			try:
+				func(*args)
+			except Exception as err:
+				self._logger.error("{me} failed to call {f}: {err}".format(me=self, f=func, err=err))
+
+	def __str__(self):
+		return "<Dispatcher, {n} pending>".format(n=len(self._calls))
+
+
+class TimerWheel(object):
+	("""Hierarchical timer wheel for coarse-grained deadlines of many actors. """
+	 """A single loop timer ticks every resolution seconds and hands all expired deadlines """
+	 """to the Dispatcher in one go, which calls each as callback(now), so callbacks may """
+	 """block (but hold up the other callbacks meanwhile). If a callback """
+	 """returns a point in time, the deadline is re-armed for then. That way, """
+	 """actors can push their deadlines back without touching the wheel. """
+	 """Each of the levels has size slots, each slot of a level spanning all slots of the """
+	 """level below; deadlines move down a level whenever the level below has come round. """
+	 """Adding and canceling a deadline take O(1).""")
+	def __init__(self, resolution=0.05, size=256, levels=4, dispatcher=None):
+		self._logger = logging.getLogger('root')
+		self._dispatcher = dispatcher
+		self.resolution = resolution
+		self._size = size
+		self._levels = [[{} for i in range(size)] for level in range(levels)]
+		self._tick = int(time.monotonic() / resolution)
+		self._pending = 0
+		self._timer = None
+
+	@classmethod
+	def instance(cls):
+		"""The wheel shared by everything running on the current hub"""
+		hub = gevent.get_hub()
+		wheel = getattr(hub, "_timer_wheel", None)
+		if wheel is None:
+			wheel = hub._timer_wheel = cls()
+		return wheel
+
+	def __len__(self):
+		return self._pending
+
+	def add(self, when, callback):
+		"""Call callback(now) once time.monotonic() has passed when"""
+		deadline = Deadline(when, callback, self)
+		if self._timer is None:
+			self._tick = max(self._tick, int(time.monotonic() / self.resolution))
+			self._timer = gevent.get_hub().loop.timer(self.resolution, self.resolution)
+			self._timer.start(self._advance)
+		self._insert(deadline, self._tick + 1)
+		self._pending += 1
+		return deadline
+
+	def _insert(self, deadline, earliest):
+		"""Put deadline into the slot of its tick, but no earlier than tick earliest"""
+		tick = max(-int(-deadline.when // self.resolution), earliest)
+		size = self._size
+		current = self._tick
+		for level in self._levels:
+			if tick - current < size or level is self._levels[-1]:
+				slot = level[min(tick, current + size - 1) % size]
+				break
+			tick //= size
+			current //= size
+		slot[deadline] = None
+		deadline._slot = slot
+
+	def _forget(self):
+		self._pending -= 1
+		if self._pending == 0 and self._timer is not None:
+			self._timer.close()
+			self._timer = None
+
+	def _cascade(self):
+		"""Move the deadlines of the higher level slots that have come round one level down"""
+		tick = self._tick
+		for level in self._levels[1:]:
+			if tick % self._size:
+				break
+			tick //= self._size
+			index = tick % self._size
+			deadlines, level[index] = level[index], {}
+			for deadline in deadlines:
+				self._insert(deadline, self._tick)
+
+	def _advance(self):
+		now = time.monotonic()
+		current = int(now / self.resolution)
+		slots = self._levels[0]
+		due = []
+		while self._tick < current and self._pending > 0:
+			self._tick += 1
+			self._cascade()
+			index = self._tick % self._size
+			expired, slots[index] = slots[index], {}
+			for deadline in expired:
+				deadline._slot = None
+				if deadline.when > now:
+					self._insert(deadline, self._tick + 1)
+				else:
+					due.append(deadline)
+		self._tick = max(self._tick, current)
+		if due:
+			(self._dispatcher or Dispatcher.instance()).call(self._fire, due)
+
+	def _fire(self, due):
+		now = time.monotonic()
+		for deadline in due:
+			if deadline.canceled:
+				continue
+			try:
+				when = deadline.callback(now)
+			except ReferenceError:
+				when = None
+			except Exception as err:
+				self._logger.error("{me} failed to call {cb}: {err}".format(me=self, cb=deadline.callback, err=err))
+				when = None
+			if deadline.canceled:
+				continue
+			elif when is None:
+				deadline.cancel()
+			else:
+				deadline.when = when
+				self._insert(deadline, self._tick + 1)
+
+	def __str__(self):
+		return "<TimerWheel, {n} pending>".format(n=self._pending)
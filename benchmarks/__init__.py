@@ -0,0 +1,5 @@
+"""Benchmarks for the actor runtime, routers, supervision and sources.
+
+Run all of them with ``python -m benchmarks``, see ``python -m benchmarks --help``.
+The standalone scripts next to this package (envelopes.py, dispatch.py,
+shortest_queue.py) compare single implementation choices and are run directly."""
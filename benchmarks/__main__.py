@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+from gevent import monkey; monkey.patch_all()
+from arago.common.logging import getCustomLogger
+from benchmarks import harness
+import benchmarks.runtime
+import benchmarks.routers
+import benchmarks.supervision
+import benchmarks.rest
+import benchmarks.scheduling
+import benchmarks.timers
+import benchmarks.overload
+import benchmarks.durable
+import benchmarks.snapshot
+import argparse
+import json
+import sys
+
+logger = getCustomLogger(level="WARNING")
+
+parser = argparse.ArgumentParser(prog="python -m benchmarks", description="Benchmark the actor system")
+parser.add_argument("names", nargs="*", help="benchmarks to run (default: all), prefixes like 'router.' select groups")
+parser.add_argument("-o", "--output", help="write the results to this JSON file (default: stdout)")
+parser.add_argument("-s", "--scale", type=float, default=1.0, help="multiply the number of iterations, e.g. 0.1 for a quick run")
+parser.add_argument("-c", "--compare", metavar="BASELINE", help="compare with the results in this JSON file, exit with 1 on regressions")
+parser.add_argument("-t", "--threshold", type=float, default=0.1, help="relative change counted as regression (default: 0.1)")
+parser.add_argument("-l", "--list", action="store_true", help="list the benchmarks and exit")
+args = parser.parse_args()
+
+if args.list:
+	print("\n".join(harness.BENCHMARKS))
+	sys.exit(0)
+
+names = [name for name in harness.BENCHMARKS if not args.names or any(name.startswith(prefix) for prefix in args.names)]
+results = harness.run(names, scale=args.scale)
+
+if args.output:
+	harness.save(results, args.output)
+else:
+	json.dump(results, sys.stdout, indent=2)
+	print()
+
+if args.compare:
+	regressions = harness.compare(results, harness.load(args.compare), threshold=args.threshold)
+	for regression in regressions:
+		print("REGRESSION " + regression, file=sys.stderr)
+	sys.exit(1 if regressions else 0)
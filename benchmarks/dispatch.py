@@ -0,0 +1,38 @@
+#!/usr/bin/env python3
+from arago.actors import Actor
+import arago.actors.pattern_matching as matching
+from arago.common.logging import getCustomLogger
+import timeit
+
+logger = getCustomLogger(level="WARNING")
+
+CLAUSES = 30
+N = 20000
+
+# Emulates an actor with CLAUSES @match(msg="command-i") clauses, a guarded one and a default
+source = "\n".join(
+	["class Commands(Actor):"]
+	+ ["\t@matching.match(msg=\"command-{i}\")\n\tdef handle(self, msg, payload, sender): return {i}".format(i=i) for i in range(CLAUSES)]
+	+ ["\t@matching.match(msg=\"guarded\", payload=matching.items(kind=\"x\"))\n\tdef handle(self, msg, payload, sender): return \"guarded\""]
+	+ ["\t@matching.default\n\tdef handle(self, msg, payload, sender): return None"]
+)
+exec(source)
+
+actor = Commands(name="commands")
+multifunc = Commands.handle
+dispatcher = matching.compiled(multifunc)
+
+for label, msg, payload in [
+	("first clause ", "command-0", None),
+	("middle clause", "command-{0}".format(CLAUSES // 2), None),
+	("last clause  ", "command-{0}".format(CLAUSES - 1), None),
+	("guarded      ", "guarded", {"kind": "x"}),
+	("default      ", "unknown", None)
+]:
+	assert multifunc(actor, msg, payload, None) == dispatcher(actor, msg, payload, None)
+	before = min(timeit.repeat(lambda: multifunc(actor, msg, payload, None), number=N, repeat=5)) / N
+	after = min(timeit.repeat(lambda: dispatcher(actor, msg, payload, None), number=N, repeat=5)) / N
+	print("{label}: MultiFunc {b:8.2f} µs, Dispatcher {a:6.2f} µs, {s:6.1f}x".format(
+		label=label, b=before * 1e6, a=after * 1e6, s=before / after))
+
+actor.stop()
@@ -0,0 +1,36 @@
+"""Throughput of actors with journaled (DurableMailbox) and in-memory mailboxes"""
+from arago.actors import DurableMailbox
+from benchmarks.harness import benchmark
+from benchmarks.runtime import Sink
+from collections import OrderedDict
+from functools import partial
+import shutil
+import tempfile
+import time
+
+MAILBOXES = OrderedDict([
+	("memory", None),
+	("journal_no_fsync", {"fsync": False}),
+	("journal_fsync", {"fsync": True}),
+])
+
+
+def with_mailbox(options, scale):
+	n = int(100000 * scale)
+	directory = tempfile.mkdtemp(prefix="benchmark-journal-")
+	try:
+		kwargs = {} if options is None else {"mailbox": partial(DurableMailbox, directory, **options)}
+		sink = Sink(name="sink", **kwargs)
+		start = time.perf_counter()
+		for i in range(n):
+			sink.tell("msg", i)
+		sink.wait_for("done")
+		elapsed = time.perf_counter() - start
+		sink.stop()
+	finally:
+		shutil.rmtree(directory, ignore_errors=True)
+	return {"tell_messages_per_sec": n / elapsed}
+
+
+for name, options in MAILBOXES.items():
+	benchmark("durable." + name)(partial(with_mailbox, options))
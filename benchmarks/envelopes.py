@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+from gevent import monkey; monkey.patch_all()
+from arago.actors import Actor
+from arago.actors.actor import Task, Message
+from arago.common.logging import getCustomLogger
+import time
+import tracemalloc
+
+logger = getCustomLogger(level="WARNING")
+
+N = 100000
+
+class Sink(Actor):
+	def handle(self, msg, payload, sender):
+		pass
+
+def per_message_time(send):
+	sink = Sink(name="sink")
+	start = time.perf_counter()
+	for i in range(N):
+		send(sink, i)
+	sink.wait_for("done")
+	elapsed = time.perf_counter() - start
+	sink.stop()
+	return elapsed / N
+
+def per_message_memory(envelope):
+	tracemalloc.start()
+	before, _ = tracemalloc.get_traced_memory()
+	envelopes = [envelope("msg", None, None) for i in range(N)]
+	after, _ = tracemalloc.get_traced_memory()
+	tracemalloc.stop()
+	return (after - before) / N
+
+for name, send, envelope in [
+	("ask  (Task)   ", lambda actor, i: actor.ask(i, sender=actor), Task),
+	("tell (Message)", lambda actor, i: actor.tell(i, sender=actor), Message)
+]:
+	print("{name}: {t:8.2f} µs/message, {m:6.1f} bytes/envelope".format(
+		name=name, t=per_message_time(send) * 1e6, m=per_message_memory(envelope)))
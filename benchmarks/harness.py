@@ -0,0 +1,102 @@
+"""Registry, measurements and result files of the benchmark suite"""
+import datetime
+import gc
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+import time
+from collections import OrderedDict
+
+import gevent
+
+BENCHMARKS = OrderedDict()
+
+
+def benchmark(name):
+	"""Register the decorated function as benchmark name.
+	It is called with a scale factor for its number of iterations and returns a dict
+	of metrics. Metrics ending in _per_sec are better when higher, all others
+	(times, bytes) when lower."""
+	def decorator(func):
+		BENCHMARKS[name] = func
+		return func
+	return decorator
+
+
+def percentiles(samples, points=(50, 90, 99, 99.9)):
+	"""Return the given percentiles of samples (in seconds) as {"p50_us": ...} in microseconds"""
+	ordered = sorted(samples)
+	if not ordered:
+		return {}
+	return OrderedDict(
+		("p{p:g}_us".format(p=p), ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))] * 1e6)
+		for p in points)
+
+
+def environment():
+	"""Describe where the results were measured"""
+	try:
+		revision = subprocess.run(["git", "rev-parse", "HEAD"], cwd=os.path.dirname(__file__),
+		                          stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+		                          universal_newlines=True).stdout.strip() or None
+	except OSError:
+		revision = None
+	return OrderedDict([
+		("timestamp", datetime.datetime.utcnow().isoformat() + "Z"),
+		("revision", revision),
+		("python", "{impl} {version}".format(impl=platform.python_implementation(), version=platform.python_version())),
+		("gevent", gevent.__version__),
+		("platform", platform.platform()),
+		("cpus", os.cpu_count()),
+	])
+
+
+def run(names=None, scale=1.0):
+	"""Run the benchmarks called names (default: all) and return the results as a dict"""
+	logger = logging.getLogger('root')
+	results = OrderedDict()
+	for name in names or BENCHMARKS:
+		gc.collect()
+		start = time.perf_counter()
+		try:
+			metrics = BENCHMARKS[name](scale)
+		except Exception as err:
+			logger.error("Benchmark {name} failed with {err!r}".format(name=name, err=err))
+			metrics = {"error": repr(err)}
+		metrics["wall_time_s"] = time.perf_counter() - start
+		results[name] = metrics
+		print("{name:32} {metrics}".format(name=name, metrics=", ".join(
+			"{k}={v:.6g}".format(k=k, v=v) if isinstance(v, float) else "{k}={v}".format(k=k, v=v)
+			for k, v in metrics.items())), file=sys.stderr)
+	return OrderedDict([("environment", environment()), ("scale", scale), ("results", results)])
+
+
+def compare(results, baseline, threshold=0.1):
+	"""Return a description of every metric in results that is more than threshold worse than in baseline"""
+	regressions = []
+	for name, metrics in results["results"].items():
+		old_metrics = baseline["results"].get(name, {})
+		for metric, value in metrics.items():
+			old = old_metrics.get(metric)
+			if metric == "wall_time_s" or not isinstance(value, (int, float)) or not isinstance(old, (int, float)) or not old:
+				continue
+			change = (value - old) / old
+			if metric.endswith("_per_sec"):
+				change = -change
+			if change > threshold:
+				regressions.append("{name}: {metric} {old:.6g} -> {new:.6g} ({change:+.1%} worse)".format(
+					name=name, metric=metric, old=old, new=value, change=change))
+	return regressions
+
+
+def save(results, path):
+	with open(path, "w") as f:
+		json.dump(results, f, indent=2)
+
+
+def load(path):
+	with open(path) as f:
+		return json.load(f)
@@ -0,0 +1,58 @@
+"""Goodput of an overloaded actor, with and without shedding of expired work"""
+from arago.actors import Actor, TaskExpiredError
+from benchmarks.harness import benchmark
+import gevent
+import time
+
+SERVICE_TIME = 0.001
+TIMEOUT = 0.1
+
+
+class Worker(Actor):
+	"""Burns SERVICE_TIME seconds of CPU per message"""
+	def handle(self, msg, payload, sender):
+		until = time.perf_counter() + SERVICE_TIME
+		while time.perf_counter() < until:
+			pass
+
+
+class NonSheddingWorker(Worker):
+	"""Handles every message, no matter how long ago everybody stopped waiting for it"""
+	def _shed(self, task):
+		return False
+
+
+def request(worker, outcomes):
+	try:
+		worker.wait_for("work", timeout=TIMEOUT)
+		outcomes.append(True)
+	except (gevent.Timeout, TaskExpiredError):
+		outcomes.append(False)
+
+
+def overload(worker_cls, scale):
+	duration = 2.0 * scale
+	worker = worker_cls(name="worker")
+	outcomes = []
+	requests = []
+	start = time.perf_counter()
+	while time.perf_counter() - start < duration:
+		# Offer twice the load the worker can handle
+		requests.extend(gevent.spawn(request, worker, outcomes) for i in range(20))
+		gevent.sleep(0.01)
+	gevent.joinall(requests)
+	elapsed = time.perf_counter() - start
+	stats = dict(worker.mailbox_stats)
+	worker.stop()
+	return {"offered_per_sec": len(requests) / duration, "goodput_per_sec": sum(outcomes) / elapsed,
+	        "timeouts": outcomes.count(False), "shed": stats.get("expired", 0) + stats.get("canceled", 0)}
+
+
+@benchmark("overload.shedding")
+def shedding(scale):
+	return overload(Worker, scale)
+
+
+@benchmark("overload.no_shedding")
+def no_shedding(scale):
+	return overload(NonSheddingWorker, scale)
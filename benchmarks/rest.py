@@ -0,0 +1,56 @@
+"""Requests per second on the REST source, over localhost"""
+from arago.actors import Actor, Monitor
+from arago.actors.sources.rest.rest_server import HIROEngineSyncRESTInterface
+from benchmarks.harness import benchmark, percentiles
+import gevent
+import http.client
+import json
+import socket
+import time
+
+CLIENTS = 16
+
+
+class Handler(Actor):
+	def handle(self, msg, payload, sender):
+		return payload
+
+
+def free_port():
+	with socket.socket() as sock:
+		sock.bind(("127.0.0.1", 0))
+		return sock.getsockname()[1]
+
+
+def client(port, n, latencies):
+	connection = http.client.HTTPConnection("127.0.0.1", port)
+	body = json.dumps({"n": 1}).encode()
+	headers = {"Content-Type": "application/json"}
+	for i in range(n):
+		start = time.perf_counter()
+		connection.request("POST", "/request", body, headers)
+		response = connection.getresponse()
+		response.read()
+		if response.status != 200:
+			raise RuntimeError("Request failed with {status}".format(status=response.status))
+		latencies.append(time.perf_counter() - start)
+	connection.close()
+
+
+@benchmark("rest.sync_requests")
+def sync_requests(scale):
+	n = int(5000 * scale) // CLIENTS
+	port = free_port()
+	handler = Handler(name="handler")
+	server = HIROEngineSyncRESTInterface(handler, "http://127.0.0.1:{port}".format(port=port), name="rest")
+	monitor = Monitor(name="monitor", children=[server, handler])
+	latencies = []
+	try:
+		start = time.perf_counter()
+		gevent.joinall([gevent.spawn(client, port, n, latencies) for i in range(CLIENTS)], raise_error=True)
+		elapsed = time.perf_counter() - start
+	finally:
+		monitor.stop()
+	metrics = {"requests_per_sec": n * CLIENTS / elapsed}
+	metrics.update(percentiles(latencies))
+	return metrics
@@ -0,0 +1,76 @@
+"""Asks fanned out through every router in arago.actors.routers"""
+from arago.actors import Actor
+from arago.actors.routers.broadcast import BroadcastRouter
+from arago.actors.routers.consistent_hashing import ConsistentHashingRouter
+from arago.actors.routers.latency_aware import LatencyAwareRouter
+from arago.actors.routers.mapping.mapping_router import MappingRouter
+from arago.actors.routers.on_demand import OnDemandRouter
+from arago.actors.routers.power_of_two import PowerOfTwoChoicesRouter
+from arago.actors.routers.process_pool import ProcessPoolRouter
+from arago.actors.routers.random import RandomRouter
+from arago.actors.routers.round_robin import RoundRobinRouter
+from arago.actors.routers.shortest_queue import ShortestQueueRouter
+from benchmarks.harness import benchmark, percentiles
+from collections import OrderedDict
+from functools import partial
+import time
+
+WORKERS = 8
+
+
+class Echo(Actor):
+	def __init__(self, name=None, target=None, *args, **kwargs):
+		super().__init__(name=name, *args, **kwargs)
+
+	def handle(self, msg, payload, sender):
+		return payload
+
+
+def echoes(n):
+	return [Echo(name="echo-{i}".format(i=i)) for i in range(n)]
+
+
+def by_payload(task):
+	return task.payload % WORKERS
+
+
+def mapping_router(name, n):
+	children = echoes(n)
+	return MappingRouter(by_payload, dict(enumerate(children)), name=name, children=children)
+
+
+ROUTERS = OrderedDict([
+	("broadcast", lambda name, n: BroadcastRouter(name=name, children=echoes(n))),
+	("consistent_hashing", lambda name, n: ConsistentHashingRouter(name=name, mapfunc=by_payload, children=echoes(n))),
+	("latency_aware", lambda name, n: LatencyAwareRouter(name=name, children=echoes(n))),
+	("mapping", mapping_router),
+	("on_demand", lambda name, n: OnDemandRouter(Echo, name=name, mapfunc=by_payload)),
+	("power_of_two", lambda name, n: PowerOfTwoChoicesRouter(name=name, children=echoes(n))),
+	("process_pool", lambda name, n: ProcessPoolRouter(Echo, processes=n, name=name)),
+	("random", lambda name, n: RandomRouter(name=name, children=echoes(n))),
+	("round_robin", lambda name, n: RoundRobinRouter(name=name, children=echoes(n))),
+	("shortest_queue", lambda name, n: ShortestQueueRouter(name=name, children=echoes(n))),
+])
+
+
+def fan_out(factory, name, scale):
+	n = int(20000 * scale)
+	router = factory(name, WORKERS)
+	router.wait_for("warmup", 0, timeout=30)
+	start = time.perf_counter()
+	tasks = [router.ask("msg", i) for i in range(n)]
+	[task.get() for task in tasks]
+	elapsed = time.perf_counter() - start
+	latencies = []
+	for i in range(n // 10):
+		start = time.perf_counter()
+		router.wait_for("msg", i)
+		latencies.append(time.perf_counter() - start)
+	router.stop()
+	metrics = {"asks_per_sec": n / elapsed}
+	metrics.update(percentiles(latencies))
+	return metrics
+
+
+for name, factory in ROUTERS.items():
+	benchmark("router." + name)(partial(fan_out, factory, name))
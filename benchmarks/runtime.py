@@ -0,0 +1,68 @@
+"""Message passing between plain actors"""
+from arago.actors import Actor
+from benchmarks.harness import benchmark, percentiles
+import gevent, gevent.event
+import time
+
+
+class Sink(Actor):
+	def handle(self, msg, payload, sender):
+		return payload
+
+
+class Player(Actor):
+	def __init__(self, name=None, done=None, *args, **kwargs):
+		super().__init__(name=name, *args, **kwargs)
+		self.done = done
+
+	def handle(self, msg, payload, sender):
+		if payload > 0:
+			sender.tell(msg, payload - 1, sender=self)
+		else:
+			self.done.set()
+
+
+@benchmark("actor.tell")
+def tell(scale):
+	n = int(100000 * scale)
+	sink = Sink(name="sink")
+	start = time.perf_counter()
+	for i in range(n):
+		sink.tell("msg", i)
+	sink.wait_for("done")
+	elapsed = time.perf_counter() - start
+	sink.stop()
+	return {"messages_per_sec": n / elapsed}
+
+
+@benchmark("actor.ask")
+def ask(scale):
+	n = int(50000 * scale)
+	sink = Sink(name="sink")
+	start = time.perf_counter()
+	tasks = [sink.ask("msg", i) for i in range(n)]
+	[task.get() for task in tasks]
+	elapsed = time.perf_counter() - start
+	latencies = []
+	for i in range(n // 10):
+		start = time.perf_counter()
+		sink.wait_for("msg", i)
+		latencies.append(time.perf_counter() - start)
+	sink.stop()
+	metrics = {"messages_per_sec": n / elapsed}
+	metrics.update(percentiles(latencies))
+	return metrics
+
+
+@benchmark("actor.ping_pong")
+def ping_pong(scale):
+	n = int(50000 * scale)
+	done = gevent.event.Event()
+	one, two = Player(name="one", done=done), Player(name="two", done=done)
+	start = time.perf_counter()
+	one.tell("ball", n * 2, sender=two)
+	done.wait()
+	elapsed = time.perf_counter() - start
+	one.stop()
+	two.stop()
+	return {"round_trips_per_sec": n / elapsed, "round_trip_us": elapsed / n * 1e6}
@@ -0,0 +1,55 @@
+"""Throughput and fairness of the cooperative-yield budgets"""
+from arago.actors import scheduling
+from arago.actors.scheduling import YieldBudget, EAGER
+from benchmarks.harness import benchmark
+from benchmarks.runtime import Sink, Player
+from collections import OrderedDict
+from functools import partial
+import gevent, gevent.event
+import time
+
+BUDGETS = OrderedDict([
+	("eager", EAGER),
+	("default", YieldBudget()),
+	("usec_1000", YieldBudget(messages=None, usec=1000)),
+	("messages_64_no_idle", YieldBudget(messages=64, usec=None, idle=False)),
+])
+
+
+def ticker(gaps, running):
+	"""Measure how late a greenlet sleeping for 1 ms gets woken up while actors are busy"""
+	while running[0]:
+		start = time.perf_counter()
+		gevent.sleep(0.001)
+		gaps.append(time.perf_counter() - start - 0.001)
+
+
+def with_budget(budget, scale):
+	n = int(100000 * scale)
+	previous, scheduling.default_budget = scheduling.default_budget, budget
+	try:
+		gaps, running = [], [True]
+		watcher = gevent.spawn(ticker, gaps, running)
+		sink = Sink(name="sink")
+		start = time.perf_counter()
+		for i in range(n):
+			sink.tell("msg", i)
+		sink.wait_for("done")
+		tell = n / (time.perf_counter() - start)
+		done = gevent.event.Event()
+		one, two = Player(name="one", done=done), Player(name="two", done=done)
+		start = time.perf_counter()
+		one.tell("ball", n, sender=two)
+		done.wait()
+		ping_pong = n / (time.perf_counter() - start)
+		running[0] = False
+		watcher.join()
+		[actor.stop() for actor in (sink, one, two)]
+	finally:
+		scheduling.default_budget = previous
+	return {"tell_messages_per_sec": tell, "ping_pong_messages_per_sec": ping_pong,
+	        "max_wakeup_delay_us": max(gaps) * 1e6 if gaps else 0.0}
+
+
+for name, budget in BUDGETS.items():
+	benchmark("scheduling." + name)(partial(with_budget, budget))
@@ -0,0 +1,37 @@
+#!/usr/bin/env python3
+from gevent import monkey; monkey.patch_all()
+from arago.actors import Actor, Router, Message
+from arago.actors.routers.shortest_queue import ShortestQueueRouter
+from arago.common.logging import getCustomLogger
+import gevent
+import time
+
+logger = getCustomLogger(level="WARNING")
+
+WORKERS = 200
+N = 20000
+
+class Worker(Actor):
+	def handle(self, msg, payload, sender):
+		gevent.sleep(0)
+
+class SortingShortestQueueRouter(Router):
+	"""The previous implementation, sorting all children per message (no actor ever had _busy)"""
+	def _route(self, msg):
+		item = sorted(self._children, key=lambda item: len(item._mailbox), reverse=False)[0]
+		return item
+
+def route_time(router_cls):
+	router = router_cls(name=router_cls.__name__, children=[Worker() for i in range(WORKERS)])
+	start = time.perf_counter()
+	for i in range(N):
+		router._forward(Message(i))
+	elapsed = time.perf_counter() - start
+	depths = [len(child._mailbox) for child in router._children]
+	router.stop()
+	return elapsed / N, max(depths) - min(depths)
+
+for router_cls in [SortingShortestQueueRouter, ShortestQueueRouter]:
+	per_message, spread = route_time(router_cls)
+	print("{name:28}: {t:8.2f} µs/message, mailbox depth spread {s}".format(
+		name=router_cls.__name__, t=per_message * 1e6, s=spread))
@@ -0,0 +1,62 @@
+"""Recovery time of a supervised actor with a large context, rebuilt or loaded from a snapshot"""
+from arago.actors import Actor, Monitor, RESTART, Snapshotting, SNAPSHOT
+from benchmarks.harness import benchmark
+from functools import partial
+import hashlib
+import os
+import shutil
+import tempfile
+import time
+
+
+def build(context, n):
+	"""Stands in for an expensive index, built from scratch"""
+	context.index = {hashlib.sha1(str(i).encode()).hexdigest(): i for i in range(n)}
+
+
+class Indexer(Actor):
+	def __init__(self, name=None, n=0, *args, **kwargs):
+		self.n = n
+		super().__init__(name=name, *args, **kwargs)
+
+	def handle(self, msg, payload, sender):
+		if msg == "crash":
+			raise RuntimeError("crash")
+		if not hasattr(self.context, "index"):
+			build(self.context, self.n)
+		return len(self.context.index)
+
+
+class SnapshottingIndexer(Snapshotting, Indexer):
+	pass
+
+
+def recovery(snapshotting, scale):
+	n = int(200000 * scale)
+	directory = tempfile.mkdtemp(prefix="benchmark-snapshot-")
+	try:
+		if snapshotting:
+			actor = SnapshottingIndexer(name="indexer", n=n, snapshot=os.path.join(directory, "context"))
+		else:
+			actor = Indexer(name="indexer", n=n)
+		monitor = Monitor(name="monitor", policy=RESTART, children=[actor])
+		actor.wait_for("lookup")
+		if snapshotting:
+			actor.wait_for(SNAPSHOT)
+		samples = []
+		for i in range(5):
+			loop = actor._loop
+			start = time.perf_counter()
+			actor.tell("crash")
+			loop.join()
+			actor.wait_for("lookup")
+			samples.append(time.perf_counter() - start)
+		monitor.stop()
+		size = os.path.getsize(os.path.join(directory, "context")) if snapshotting else 0
+	finally:
+		shutil.rmtree(directory, ignore_errors=True)
+	return {"recovery_ms": min(samples) * 1e3, "snapshot_bytes": size}
+
+
+benchmark("snapshot.rebuild")(partial(recovery, False))
+benchmark("snapshot.load")(partial(recovery, True))
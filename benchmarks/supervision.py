@@ -0,0 +1,90 @@
+"""Supervision: restarting crashed children, spawning workers and the cost of idle actors"""
+from arago.actors import Actor, Monitor, RESTART, ActorStoppedError
+from arago.actors.routers.on_demand import OnDemandRouter
+from benchmarks.harness import benchmark
+import gevent
+import logging
+import os
+import time
+import tracemalloc
+
+
+class Crasher(Actor):
+	def __init__(self, name=None, target=None, *args, **kwargs):
+		super().__init__(name=name, *args, **kwargs)
+
+	def handle(self, msg, payload, sender):
+		if msg == "crash":
+			raise RuntimeError("crashing on purpose")
+		return payload
+
+
+class Idle(Actor):
+	def handle(self, msg, payload, sender):
+		pass
+
+
+def rss():
+	"""Resident set size of this process in bytes, None where /proc is not available"""
+	try:
+		with open("/proc/self/statm") as f:
+			return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+	except (OSError, ValueError):
+		return None
+
+
+@benchmark("monitor.restart_storm")
+def restart_storm(scale):
+	n = int(1000 * scale)
+	children = [Crasher(name="crasher-{i}".format(i=i)) for i in range(n)]
+	monitor = Monitor(name="monitor", policy=RESTART, children=children)
+	logger = logging.getLogger('root')
+	level = logger.level
+	logger.setLevel(logging.CRITICAL)
+	try:
+		start = time.perf_counter()
+		for child in children:
+			child.tell("crash")
+		for child in children:
+			while True:
+				try:
+					child.wait_for("ping")
+					break
+				except ActorStoppedError:
+					gevent.sleep(0)
+		elapsed = time.perf_counter() - start
+	finally:
+		logger.setLevel(level)
+	monitor.stop()
+	return {"recovery_time_s": elapsed, "restarts_per_sec": n / elapsed}
+
+
+@benchmark("on_demand.spawn")
+def on_demand_spawn(scale):
+	n = int(10000 * scale)
+	router = OnDemandRouter(Crasher, name="on_demand", mapfunc=lambda task: task.payload)
+	start = time.perf_counter()
+	tasks = [router.ask("msg", i) for i in range(n)]
+	[task.get() for task in tasks]
+	elapsed = time.perf_counter() - start
+	router.stop()
+	return {"spawns_per_sec": n / elapsed}
+
+
+@benchmark("actor.idle_memory")
+def idle_memory(scale):
+	n = int(10000 * scale)
+	tracemalloc.start()
+	rss_before = rss()
+	before, _ = tracemalloc.get_traced_memory()
+	actors = [Idle(name="idle-{i}".format(i=i)) for i in range(n)]
+	gevent.sleep(0)
+	after, _ = tracemalloc.get_traced_memory()
+	rss_after = rss()
+	tracemalloc.stop()
+	metrics = {"python_bytes_per_actor": (after - before) / n}
+	if rss_before is not None:
+		metrics["rss_bytes_per_actor"] = (rss_after - rss_before) / n
+	monitor = Monitor(name="monitor", children=actors)
+	monitor.stop()
+	return metrics
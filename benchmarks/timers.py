@@ -0,0 +1,45 @@
+"""Many timers on the shared Scheduler"""
+from arago.actors import Actor
+from arago.actors.scheduler import Scheduler
+from benchmarks.harness import benchmark, percentiles
+import gevent
+import time
+
+
+class Recorder(Actor):
+	"""Records how late each timeout is told, i.e. without the time it waits in the mailbox"""
+	def __init__(self, name=None, *args, **kwargs):
+		super().__init__(name=name, *args, **kwargs)
+		self.delays = []
+
+	def tell(self, msg, payload=None, sender=None, priority=0, deadline=None):
+		if msg == "timeout":
+			self.delays.append(time.monotonic() - payload)
+		super().tell(msg, payload=payload, sender=sender, priority=priority, deadline=deadline)
+
+	def handle(self, msg, payload, sender):
+		pass
+
+
+@benchmark("scheduler.schedule_once")
+def schedule_once(scale):
+	n = int(50000 * scale)
+	scheduler = Scheduler.instance()
+	recorder = Recorder(name="recorder")
+	start = time.perf_counter()
+	handles = []
+	for i in range(n):
+		delay = 0.5 + 2.5 * i / n
+		handles.append(scheduler.schedule_once(recorder, "timeout", delay, payload=time.monotonic() + delay))
+	scheduled = time.perf_counter() - start
+	start = time.perf_counter()
+	for handle in handles[::2]:
+		handle.cancel()
+	canceled = time.perf_counter() - start
+	gevent.sleep(3.1)
+	recorder.wait_for("done")
+	recorder.stop()
+	metrics = {"schedules_per_sec": n / scheduled, "cancels_per_sec": (n // 2) / canceled,
+	           "fired": len(recorder.delays)}
+	metrics.update(("lateness_" + key, value) for key, value in percentiles(recorder.delays).items())
+	return metrics
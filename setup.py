@@ -21,13 +21,18 @@ distutils.core.setup(
 	],
 	packages=['arago.actors',
 			  'arago.actors.routers.broadcast',
+			  'arago.actors.routers.coalescing',
 			  'arago.actors.routers.consistent_hashing',
+			  'arago.actors.routers.latency_aware',
 			  'arago.actors.routers.mapping',
 			  'arago.actors.routers.on_demand',
+			  'arago.actors.routers.power_of_two',
+			  'arago.actors.routers.process_pool',
 			  'arago.actors.routers.random',
 			  'arago.actors.routers.round_robin',
 			  'arago.actors.routers.shortest_queue',
 			  'arago.actors.sources.timer',
+			  'arago.actors.sources.remote',
 			  'arago.actors.sources.rest'
 	],
 	install_requires=['gevent', 'function_pattern_matching', 'better_exceptions', 'fastjsonschema']